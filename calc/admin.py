@@ -1,3 +1,11 @@
 from django.contrib import admin
 
+from calc.models import GenerationJob
+
 # Register your models here.
+
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'output', 'progress', 'total', 'attempts', 'created', 'expires_at')
+    list_filter = ('status', 'output')
@@ -0,0 +1,92 @@
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+def spacing_between_bars(diameter: float, diameter_aggregate: float = 16) -> float:
+    return math.ceil(max(diameter, 20, diameter_aggregate + 5)) + diameter
+
+
+@dataclass(frozen=True)
+class BarRow:
+    """Warstwa pretow w przekroju: x = start + step * i (od lewej krawedzi), depth - od krawedzi gornej/dolnej"""
+    start: float
+    step: float
+    count: int
+    depth: float
+
+    def points(self, x0: float, y0: float, turn: int = 1) -> list[tuple[float, float]]:
+        return [(x0 + self.start + self.step * i, y0 + turn * self.depth) for i in range(self.count)]
+
+
+@dataclass(frozen=True)
+class BarLayout:
+    rows: tuple[BarRow, ...]
+    layer_spacing: float
+    fits: bool
+
+    @property
+    def quantity(self) -> int:
+        return sum(row.count for row in self.rows)
+
+    def points(self, x0: float, y0: float, turn: int = 1) -> list[tuple[float, float]]:
+        points = []
+        for row in self.rows:
+            points.extend(row.points(x0, y0, turn))
+        return points
+
+
+def max_gaps(width: float, spacing: float, limit: int) -> int:
+    """Najwieksza ilosc odstepow k <= limit, dla ktorej width / k >= spacing (0 gdy nie miesci sie ani jeden)"""
+    if limit < 1 or width < spacing:
+        return 0
+    gaps = min(limit, max(1, math.floor(width / spacing)))
+    # poprawka zaokraglen dzielenia, warunek sprawdzany tak samo jak przy rozmieszczaniu
+    while gaps > 1 and width / gaps < spacing:
+        gaps -= 1
+    while gaps < limit and width / (gaps + 1) >= spacing:
+        gaps += 1
+    return gaps
+
+
+def _row(start: float, end: float, count: int, depth: float) -> BarRow:
+    return BarRow(start, (end - start) / (count - 1) if count > 1 else 0, count, depth)
+
+
+@lru_cache(maxsize=1024)
+def solve_bar_layout(beam_width: float, beam_height: float, cover_left: float, cover_right: float,
+                     cover_edge: float, diameter_stirrup: float, bending: float, diameter: float,
+                     quantity: int) -> BarLayout:
+    """
+    Rozmieszczenie pretow glownych w przekroju, w warstwach od krawedzi (cover_edge - otulina gorna lub dolna).
+    Pierwsza warstwa w narozach strzemienia (bending - wygiecie strzemienia), tyle pretow ile miesci sie przy
+    minimalnym rozstawie; pozostale prety w kolejnych warstwach co spacing_between_bars.
+    fits=False - warstwy wychodza poza przekroj.
+    """
+    if quantity < 1:
+        raise ValueError(f"quantity of bars {quantity} is less than 1")
+    if bending - diameter_stirrup / 2 >= diameter / 2:
+        first = (cover_left + diameter_stirrup / 2 + bending, beam_width - cover_right - diameter_stirrup / 2 - bending)
+    else:
+        first = (cover_left + diameter_stirrup + diameter / 2, beam_width - cover_right - diameter_stirrup - diameter / 2)
+    value = spacing_between_bars(diameter)
+    center = cover_edge + diameter_stirrup + diameter / 2
+
+    first_line = max_gaps(first[1] - first[0], value, quantity - 1) + 1
+    rows = [_row(first[0], first[1], first_line, center)]
+
+    rest = quantity - first_line
+    if rest > 0:
+        second = (cover_left + diameter_stirrup + diameter / 2,
+                  beam_width - cover_left - diameter_stirrup - diameter / 2)
+        per_row = max_gaps(second[1] - second[0], value, rest - 1) + 1
+        layer = 1
+        while rest > 0:
+            count = min(per_row, rest)
+            rows.append(_row(second[0], second[1], count, center + layer * value))
+            rest -= count
+            layer += 1
+
+    fits = rows[-1].depth + diameter / 2 <= beam_height - cover_edge - diameter_stirrup
+    return BarLayout(rows=tuple(rows), layer_spacing=value, fits=fits)
+
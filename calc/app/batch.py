@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from ezdxf.math import BoundingBox2d
+
+from calc.app.cache import DxfCache, cache_key
+from calc.app.cost import Watchdog, estimate_cost
+from calc.app.engine import GenerationBusy, GenerationService, build_dxf
+from calc.app.mainclass import DxfElement
+from calc.app.params import parse_beam_params
+
+
+class BatchError(ValueError):
+    pass
+
+
+def read_rows(data: bytes, filename: str = '', content_type: str = '') -> list[dict]:
+    """Wiersze z pliku CSV (naglowek = nazwy pol formularza) albo JSON (lista obiektow lub {"beams": [...]})"""
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or 'json' in content_type or text.lstrip().startswith(('[', '{')):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as error:
+            raise BatchError(f"invalid JSON: {error}")
+        if isinstance(rows, dict):
+            rows = rows.get('beams')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise BatchError("JSON must be a list of objects")
+        return rows
+
+    try:
+        dialect = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return list(csv.DictReader(io.StringIO(text), dialect=dialect))
+
+
+def parse_rows(rows: Iterable[dict]) -> tuple[list[tuple[int, dict]], list[dict]]:
+    """Parametry DxfElement dla poprawnych wierszy i lista bledow (wiersze numerowane od 1)"""
+    items, errors = [], []
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            items.append((row_number, parse_beam_params(row)))
+        except KeyError as error:
+            errors.append({'row': row_number, 'error': f"missing field {error}"})
+        except (TypeError, ValueError) as error:
+            errors.append({'row': row_number, 'error': str(error)})
+    return items, errors
+
+
+def admit_rows(items: list[tuple[int, dict]], errors: list, budget: dict) -> list[tuple[int, dict]]:
+    """Wiersze w budzecie kosztu (estimate_cost); pozostale trafiaja do errors"""
+    admitted = []
+    for row_number, params in items:
+        over = estimate_cost(params).over(budget)
+        if over:
+            errors.append({'row': row_number, 'error': "over budget: " + ', '.join(
+                f"{name} {value} > {limit}" for name, (value, limit) in over.items())})
+        else:
+            admitted.append((row_number, params))
+    return admitted
+
+
+def entry_name(row_number: int, params: dict) -> str:
+    name = re.sub(r'[^\w.-]+', '_', str(params['name'])) or 'Belka'
+    return f'{row_number:03d}_{name}.dxf'
+
+
+def build_files(items: list[tuple[int, dict]], errors: list, cache: DxfCache, service: GenerationService,
+                progress: Callable[[int], None] = None) -> Iterator[tuple[str, bytes]]:
+    """
+    Pliki DXF kolejnych wierszy - zlecane sa najwyzej 2 wiersze na proces puli naraz, wyniki oddawane
+    w kolejnosci. Wiersz utracony przez zabicie puli (zawieszony inny wiersz - GenerationBusy) jest ponawiany
+    raz na nowej puli. Bledy budowania sa dopisywane do errors, na koncu plik errors.json jesli byly bledy.
+    """
+    window = 2 * max(service.max_workers, 1)
+    rows = iter(items)
+    pending = deque()
+    done = 0
+
+    def submit(params: dict):
+        return service.submit(build_dxf, params, service.deterministic, service.time_budget)
+
+    while True:
+        for row_number, params in islice(rows, window - len(pending)):
+            key = cache_key(params, deterministic=service.deterministic)
+            data = cache.get(key)
+            pending.append((row_number, params, key, data if data is not None else submit(params)))
+        if not pending:
+            break
+        row_number, params, key, result = pending.popleft()
+        done += 1
+        if not isinstance(result, bytes):
+            try:
+                try:
+                    result = service.result(result)
+                except GenerationBusy:
+                    result = service.result(submit(params))
+            except Exception as error:
+                errors.append({'row': row_number, 'error': str(error) or type(error).__name__})
+                result = None
+            else:
+                cache.put(key, result)
+        if progress is not None:
+            progress(done)
+        if result is not None:
+            yield entry_name(row_number, params), result
+
+    if errors:
+        errors.sort(key=lambda error: error['row'])
+        yield 'errors.json', json.dumps(errors, indent=2).encode('utf-8')
+
+
+class _ZipBuffer:
+    """Strumien bez seek() dla zipfile - zawartosc jest oddawana po kazdym zapisanym pliku"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(files: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    """ZIP budowany w locie: kolejne pliki sa wysylane od razu, bez skladania calego archiwum w pamieci"""
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def build_combined(items: list[tuple[int, dict]], gap: float = 1000, format: str = None,
+                   deterministic: bool = False, time_budget: float = None) -> tuple[bytes, list[dict]]:
+    """
+    Wszystkie belki na jednym rysunku, jedna obok drugiej (przesuniecie start_point_x).
+    format - 'ascii'/'binary', domyslnie format pierwszej belki; time_budget [s] - limit czasu jednej belki
+    """
+    drawing = dxfversion = None
+    start_point_x = 0
+    errors = []
+    extents = BoundingBox2d()
+    for row_number, params in items:
+        if drawing is not None and params.get('dxfversion', dxfversion) != dxfversion:
+            # belka dorysowywana do wspolnego rysunku dostalaby jego wersje DXF, nie zadana
+            errors.append({'row': row_number,
+                           'error': f"dxfversion {params['dxfversion']} differs from the drawing ({dxfversion})"})
+            continue
+        msp_count = len(drawing.modelspace()) if drawing is not None else 0
+        layouts = set(drawing.layouts.names()) if drawing is not None else set()
+        blocks = {block.name for block in drawing.blocks} if drawing is not None else set()
+        try:
+            with Watchdog(time_budget) as watchdog:
+                element = DxfElement(**dict(params, start_point_x=start_point_x), drawing=drawing,
+                                     deterministic=deterministic, watchdog=watchdog)
+        except Exception as error:
+            errors.append({'row': row_number, 'error': str(error) or type(error).__name__})
+            if drawing is not None:
+                # usuniecie czesciowo narysowanego elementu
+                msp = drawing.modelspace()
+                for entity in list(msp)[msp_count:]:
+                    msp.delete_entity(entity)
+                for name in set(drawing.layouts.names()) - layouts:
+                    drawing.layouts.delete(name)
+                for name in {block.name for block in drawing.blocks} - blocks:
+                    drawing.blocks.delete_block(name, safe=False)
+            continue
+        if drawing is None:
+            drawing = element.drawing
+            dxfversion = element.dxfversion
+            format = format or element.format
+        start_point_x += element.drawing_width() + gap
+        extents.extend([element.extents.extmin, element.extents.extmax])
+        last = element
+
+    if drawing is None:
+        return b'', errors
+    # widok na wszystkie belki, nie tylko ostatnia
+    last.extents = extents
+    return last.to_bytes(format), errors
@@ -0,0 +1,147 @@
+import random
+import time
+import tracemalloc
+
+from calc.app.mainclass import DxfElement
+from calc.app.timing import StageTimer
+
+# zakresy losowania parametrow jak w calc/app/beam.py (randrange: start, stop, krok - stop bez wlaczenia)
+DIAMETERS = (12, 16, 20, 24, 28, 32)
+STIRRUP_DIAMETERS = (6, 8)
+SPAN = (400, 6000, 25)
+HEIGHT = (200, 800, 50)
+WIDTH = (150, 500, 50)
+SUPPORT = (150, 500, 50)
+COVER = (15, 80, 5)
+FIRST_ROW_SPACING = (70, 300, 5)
+# beam.py nie losuje ilosci pretow - przyjety zakres dla typowych belek
+QUANTITY = (2, 7, 1)
+
+# dopuszczalny wzrost metryki wzgledem bazowej (0.25 - o 25%); czasy ponizej TIME_FLOOR [ms] to szum pomiaru
+THRESHOLDS = {'time': 0.25, 'memory': 0.10, 'entities': 0.0, 'size': 0.02}
+TIME_FLOOR = 2.0
+
+
+def _beam(name: str, span: float, height: float, width: float, support_left: float, support_right: float,
+          diameter_top: int, quantity_top: int, diameter_bottom: int, quantity_bottom: int, diameter_stirrup: int,
+          covers: tuple, range_left: float, range_right: float, spacing_left: float, spacing_right: float,
+          secondary_spacing: float = 400) -> dict:
+    cover_top, cover_bottom, cover_view_left, cover_view_right, cover_left, cover_right = covers
+    return {
+        'name': name, 'beam_span': span, 'beam_height': height, 'beam_width': width,
+        'width_support_left': support_left, 'width_support_right': support_right,
+        'diameter_main_top': diameter_top, 'quantity_main_top': quantity_top, 'steel_grade_main_top': 'B500SP',
+        'diameter_main_bottom': diameter_bottom, 'quantity_main_bottom': quantity_bottom,
+        'steel_grade_main_bottom': 'B500SP', 'diameter_stirrup': diameter_stirrup, 'steel_grade_stirrup': 'B500SP',
+        'cover_top': cover_top, 'cover_bottom': cover_bottom, 'cover_view_left': cover_view_left,
+        'cover_view_right': cover_view_right, 'cover_left': cover_left, 'cover_right': cover_right,
+        'first_row_stirrup_range_left': range_left, 'first_row_stirrup_range_right': range_right,
+        'first_row_stirrup_spacing_left': spacing_left, 'first_row_stirrup_spacing_right': spacing_right,
+        'secondary_stirrup_spacing': secondary_spacing, 'number_of_elements': 1, 'language': 'pl',
+    }
+
+
+def corpus(seed: int = 2022, typical: int = 6) -> list[dict]:
+    """
+    Staly zestaw belek do pomiarow: najmniejsza z zakresow beam.py, `typical` losowych (ziarno seed)
+    i najgorszy przypadek - rozpietosc 15 m, 40 pretow gora i dol, geste strzemiona.
+    """
+    rng = random.Random(seed)
+    beams = [_beam('small', SPAN[0], HEIGHT[0], WIDTH[0], SUPPORT[0], SUPPORT[0], DIAMETERS[0], 2, DIAMETERS[0], 2,
+                   STIRRUP_DIAMETERS[0], (COVER[0],) * 6, SPAN[0] // 8, SPAN[0] // 8,
+                   FIRST_ROW_SPACING[0], FIRST_ROW_SPACING[0])]
+
+    for number in range(1, typical + 1):
+        span = rng.randrange(*SPAN)
+        beams.append(_beam(
+            f'typical-{number}', span, rng.randrange(*HEIGHT), rng.randrange(*WIDTH),
+            rng.randrange(*SUPPORT), rng.randrange(*SUPPORT),
+            rng.choice(DIAMETERS), rng.randrange(*QUANTITY), rng.choice(DIAMETERS), rng.randrange(*QUANTITY),
+            rng.choice(STIRRUP_DIAMETERS), tuple(rng.randrange(*COVER) for _ in range(6)),
+            rng.randrange(span // 8, span // 4), rng.randrange(span // 8, span // 4),
+            rng.randrange(*FIRST_ROW_SPACING), rng.randrange(*FIRST_ROW_SPACING)))
+
+    span = 15000
+    beams.append(_beam('worst', span, HEIGHT[1] - HEIGHT[2], WIDTH[1] - WIDTH[2], SUPPORT[1] - SUPPORT[2],
+                       SUPPORT[1] - SUPPORT[2], DIAMETERS[-1], 40, DIAMETERS[-1], 40, STIRRUP_DIAMETERS[-1],
+                       (COVER[0],) * 6, span // 4, span // 4, FIRST_ROW_SPACING[0], FIRST_ROW_SPACING[0],
+                       secondary_spacing=100))
+    return beams
+
+
+def measure(params: dict, repeat: int = 5) -> dict:
+    """
+    Czasy etapow i calosci [ms] - najlepszy z `repeat` budowan (najmniej zaklocen od innych procesow),
+    szczyt pamieci [kB] (osobny przebieg, tracemalloc spowalnia), liczba obiektow dokumentu, rozmiar pliku.
+    """
+    stages, totals = {}, []
+    for _ in range(repeat):
+        timer = StageTimer()
+        start = time.perf_counter()
+        element = DxfElement(**params, timer=timer)
+        data = element.to_bytes()
+        totals.append((time.perf_counter() - start) * 1000)
+        for name, duration, _ in timer.stages:
+            stages.setdefault(name, []).append(duration)
+
+    tracemalloc.start()
+    try:
+        DxfElement(**params).to_bytes()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'stages': {name: round(min(durations), 3) for name, durations in stages.items()},
+        'total': round(min(totals), 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'entities': len(element.drawing.entitydb),
+        'size': len(data),
+    }
+
+
+def run_suite(beams: list[dict], repeat: int = 5) -> dict:
+    # pierwsze budowanie w procesie przygotowuje szablon rysunku - poza pomiarem
+    DxfElement(**beams[0]).to_bytes()
+    return {params['name']: measure(params, repeat) for params in beams}
+
+
+def best_of(first: dict, second: dict) -> dict:
+    """Lepszy z dwoch pomiarow tej samej belki, metryka po metryce"""
+    return {
+        'stages': {name: min(duration, second['stages'].get(name, duration))
+                   for name, duration in first['stages'].items()},
+        'total': min(first['total'], second['total']),
+        'peak_memory_kb': min(first['peak_memory_kb'], second['peak_memory_kb']),
+        'entities': min(first['entities'], second['entities']),
+        'size': min(first['size'], second['size']),
+    }
+
+
+def _regressed(value: float, base: float, threshold: float, floor: float = 0) -> bool:
+    return value > base * (1 + threshold) and value - base > floor
+
+
+def compare(results: dict, baseline: dict, thresholds: dict = None) -> list[tuple[str, str, float, float, float]]:
+    """
+    Metryki gorsze od bazowych o wiecej niz prog: (belka, metryka, wartosc, bazowa, prog).
+    Belki i etapy bez wartosci bazowej sa pomijane.
+    """
+    thresholds = dict(THRESHOLDS, **(thresholds or {}))
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        checks = [(f'{stage} [ms]', value, base['stages'].get(stage), thresholds['time'], TIME_FLOOR)
+                  for stage, value in metrics['stages'].items()]
+        checks += [
+            ('total [ms]', metrics['total'], base.get('total'), thresholds['time'], TIME_FLOOR),
+            ('peak memory [kB]', metrics['peak_memory_kb'], base.get('peak_memory_kb'), thresholds['memory'], 0),
+            ('entities', metrics['entities'], base.get('entities'), thresholds['entities'], 0),
+            ('size [B]', metrics['size'], base.get('size'), thresholds['size'], 0),
+        ]
+        for metric, value, base_value, threshold, floor in checks:
+            if base_value is not None and _regressed(value, base_value, threshold, floor):
+                regressions.append((name, metric, value, base_value, threshold))
+    return regressions
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from calc.app.mainclass import GENERATOR_VERSION
+
+
+def _normalize(value):
+    """Sprowadzenie wartosci do postaci kanonicznej: 3000, 3000.0 i '3000' daja ten sam klucz"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def cache_key(params: dict, version: str = GENERATOR_VERSION, deterministic: bool = False) -> str:
+    """
+    Klucz zalezny tylko od znormalizowanych parametrow belki, wersji generatora i trybu zapisu
+    (deterministic - plik deterministyczny ma inne metadane niz zwykly)
+    """
+    canonical = {field: _normalize(value) for field, value in params.items()}
+    payload = json.dumps([version, bool(deterministic), canonical], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DxfCache:
+    """
+    Cache gotowych plikow DXF na dysku lokalnym, ograniczony rozmiarem (LRU).
+    Kazda wersja generatora ma osobny katalog v<wersja>, przy zmianie wersji usuwane sa tylko katalogi v*
+    (inne katalogi w DXF_CACHE_DIR zostaja).
+    Limit max_bytes dotyczy jednego procesu: proces liczy wpisy zastane na dysku przy starcie i te, ktore sam
+    zapisal lub odczytal, wiec przy N procesach serwera katalog moze urosnac do okolo N * max_bytes.
+    """
+    suffix = '.dxf'
+    prefix = 'v'
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, version: str = GENERATOR_VERSION):
+        self.root = directory
+        self.version = version
+        self.directory = os.path.join(directory, self.prefix + version)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _load(self):
+        """Usuniecie katalogow innych wersji generatora i odtworzenie kolejnosci LRU z czasow modyfikacji"""
+        os.makedirs(self.directory, exist_ok=True)
+        own = os.path.basename(self.directory)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(self.prefix) and name != own and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+
+    def get(self, key: str) -> bytes or None:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._discard(key)
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key not in self._entries:
+                # wpis zapisany przez inny proces
+                self._entries[key] = len(data)
+                self._size += len(data)
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _discard(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self):
+        """Usuniecie wszystkich wpisow, np. po zmianie GENERATOR_VERSION bez restartu procesu"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'size': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,45 @@
+import gzip
+import zlib
+
+# obslugiwane kodowania w kolejnosci preferencji (przy rownym q w Accept-Encoding)
+ENCODINGS = ('gzip', 'deflate')
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Accept-Encoding jako {kodowanie: q}, np. 'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate_encoding(header: str) -> str or None:
+    """Najlepsze obslugiwane kodowanie z naglowka Accept-Encoding, None - odpowiedz bez kompresji"""
+    accepted = parse_accept_encoding(header or '')
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    """gzip bez czasu w naglowku (te same dane - te same bajty), deflate w formacie zlib jak wymaga HTTP"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(data, level)
+    raise ValueError(f"encoding {encoding} is not one of {', '.join(ENCODINGS)}")
@@ -0,0 +1,116 @@
+import math
+import signal
+import threading
+import time
+from dataclasses import dataclass
+
+from calc.app.spacing import SPACING_STEP
+
+# pozycje wykazu stali (pret gorny, dolny, strzemie) i stale kolumny/wiersze tabeli obok kolumn srednic
+BILL_POSITIONS = 3
+TABLE_FIXED_COLUMNS = 6
+TABLE_FIXED_ROWS = 6
+
+# SIGALRM tylko w procesach roboczych puli (allow_alarm) - w procesie serwera sygnal i jego obsluga
+# naleza do serwera, takze w glownym watku (DXF_WORKERS = 0)
+_alarm_allowed = False
+
+
+class BuildTimeout(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BuildCost:
+    """Szacunek wielkosci rysunku przed budowaniem, bez liczenia polozen strzemion"""
+    stirrups: int
+    bars: int
+    table_cells: int
+
+    def over(self, budget: dict) -> dict[str, tuple[int, int]]:
+        """Pozycje ponad budzet: {nazwa: (szacunek, budzet)}; brak pozycji w budzecie - bez limitu"""
+        return {name: (getattr(self, name), limit) for name, limit in budget.items()
+                if getattr(self, name) > limit}
+
+    def as_dict(self) -> dict:
+        return {'stirrups': self.stirrups, 'bars': self.bars, 'table_cells': self.table_cells}
+
+
+def _first_row_count(range_value: float, spacing: float) -> int:
+    if range_value and spacing:
+        return math.ceil(range_value / spacing) + 1
+    return 0
+
+
+def estimate_cost(params: dict) -> BuildCost:
+    """
+    Liczba strzemion (strefy pierwszego rzedu + drugi rzad jak w solve_stirrup_spacing, bez doboru rozstawu),
+    pretow glownych i komorek wykazu stali. Koszt rosnie z iloscia strzemion - rozstaw bliski 0 daje ich miliony,
+    number_of_elements zmienia tylko liczby w wykazie.
+    """
+    span = params['beam_span']
+    range_left, range_right = params['first_row_stirrup_range_left'], params['first_row_stirrup_range_right']
+    spacing_left, spacing_right = params['first_row_stirrup_spacing_left'], params['first_row_stirrup_spacing_right']
+    first_rows = sum(math.ceil(range_value / spacing) * spacing
+                     for range_value, spacing in ((range_left, spacing_left), (range_right, spacing_right))
+                     if range_value and spacing)
+    # rozstaw drugiego rzedu jak w BeamModel: nie wiekszy niz 400 i 0.75 * 0.9 wysokosci, co SPACING_STEP
+    secondary = math.floor(min(params['secondary_stirrup_spacing'], 400, 0.675 * params['beam_height'])
+                           / SPACING_STEP) * SPACING_STEP
+    middle = math.floor(max(span - first_rows, 0) / max(secondary, SPACING_STEP)) + 1
+    stirrups = _first_row_count(range_left, spacing_left) + _first_row_count(range_right, spacing_right) + middle
+
+    diameters = {(params['steel_grade_main_top'], params['diameter_main_top']),
+                 (params['steel_grade_main_bottom'], params['diameter_main_bottom']),
+                 (params['steel_grade_stirrup'], params['diameter_stirrup'])}
+    table_cells = (TABLE_FIXED_ROWS + BILL_POSITIONS) * (TABLE_FIXED_COLUMNS + len(diameters))
+    return BuildCost(stirrups=stirrups, bars=int(params['quantity_main_top']) + int(params['quantity_main_bottom']),
+                     table_cells=table_cells)
+
+
+def allow_alarm():
+    """initializer procesow roboczych puli: Watchdog przerywa budowanie sygnalem SIGALRM"""
+    global _alarm_allowed
+    _alarm_allowed = True
+
+
+class Watchdog:
+    """
+    Budzet czasu [s] budowania jednego rysunku (with Watchdog(budget) as watchdog: ...).
+    W procesie roboczym puli (allow_alarm) SIGALRM przerywa budowanie w dowolnym miejscu, poza nim - check()
+    miedzy etapami rysunku (termin w obiekcie, kazde budowanie ma wlasny). Przekroczenie - BuildTimeout.
+    budget=None - bez limitu.
+    """
+
+    def __init__(self, budget: float = None):
+        self.budget = budget
+        self.deadline = None
+        self._alarm = False
+        self._previous_handler = None
+
+    def _expired(self, *args):
+        raise BuildTimeout(f"drawing exceeded {self.budget} s")
+
+    def __enter__(self) -> 'Watchdog':
+        if self.budget is None:
+            return self
+        self.deadline = time.monotonic() + self.budget
+        if _alarm_allowed and hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGALRM, self._expired)
+            signal.setitimer(signal.ITIMER_REAL, self.budget)
+            self._alarm = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler or signal.SIG_DFL)
+            self._alarm = False
+        self.deadline = None
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self._expired()
+
+
+NO_WATCHDOG = Watchdog()
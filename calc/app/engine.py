@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from calc.app.cost import BuildTimeout, Watchdog, allow_alarm
+from calc.app.mainclass import DxfElement
+from calc.app.timing import StageTimer
+
+
+class GenerationTimeout(Exception):
+    pass
+
+
+class GenerationBusy(Exception):
+    """
+    Limit zadan w toku zajety (GenerationLimiter) albo pula procesow wymieniona w trakcie zadania,
+    odpowiedz 503 z Retry-After
+    """
+
+
+def build_dxf(params: dict, deterministic: bool = False, time_budget: float = None) -> bytes:
+    """Budowanie rysunku w procesie roboczym, zwraca gotowy plik DXF; time_budget [s] - limit czasu (Watchdog)"""
+    try:
+        with Watchdog(time_budget) as watchdog:
+            return DxfElement(**params, deterministic=deterministic, watchdog=watchdog).to_bytes()
+    except BuildTimeout as error:
+        raise GenerationTimeout(str(error)) from None
+
+
+def build_dxf_timed(params: dict, deterministic: bool = False,
+                    time_budget: float = None) -> tuple[bytes, list[tuple[str, float, int]]]:
+    """Jak build_dxf, razem z czasami etapow (nazwa, ms, nowe obiekty) - mierzone w procesie roboczym"""
+    timer = StageTimer()
+    try:
+        with Watchdog(time_budget) as watchdog:
+            data = DxfElement(**params, timer=timer, deterministic=deterministic, watchdog=watchdog).to_bytes()
+    except BuildTimeout as error:
+        raise GenerationTimeout(str(error)) from None
+    return data, timer.stages
+
+
+def _mp_context():
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+class GenerationLimiter:
+    """
+    Ograniczenie liczby zadan generowania w toku (wykonywane + czekajace w puli) dla widokow async.
+    Bez czekania w kolejce: gdy limit jest zajety, acquire() zwraca False i widok od razu odpowiada 503.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+
+
+class GenerationService:
+    """
+    Budowanie rysunkow w osobnej puli procesow, zeby generowanie (czysty Python, CPU) nie blokowalo watkow serwera.
+    max_workers=0 - budowanie w biezacym watku (np. serwer deweloperski, testy).
+    Procesy startuja z forkserver (spawn, gdy niedostepny) - fork serwera z watkami nie jest bezpieczny;
+    proces po max_tasks_per_worker zadaniach wymienia sama pula (max_tasks_per_child), bez przerywania zadan.
+    deterministic=True - rysunki w trybie deterministycznym (te same parametry - te same bajty pliku).
+    time_budget [s] - limit czasu budowania jednego rysunku w procesie roboczym (Watchdog), proces wraca do puli.
+    Zadanie ponad timeout zabija procesy puli, kolejne zadania dostaja nowa pule; pozostale zadania
+    zabitej puli koncza sie GenerationBusy.
+    """
+
+    def __init__(self, max_workers: int = 1, timeout: float = None, max_tasks_per_worker: int = None,
+                 deterministic: bool = False, time_budget: float = None):
+        self.max_workers = max_workers
+        self.deterministic = deterministic
+        self.time_budget = time_budget
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context(),
+                                                 initializer=allow_alarm,
+                                                 max_tasks_per_child=self.max_tasks_per_worker or None)
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if not self.max_workers:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        with self._lock:
+            try:
+                return self._get_executor().submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # proces puli padl (np. brak pamieci) - zadanie na nowej puli
+                self._executor = None
+                return self._get_executor().submit(fn, *args, **kwargs)
+
+    def result(self, future: Future, timeout: float = None):
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            self._abandon(future)
+            raise GenerationTimeout(f"generation exceeded {self.timeout} s")
+        except BrokenProcessPool:
+            raise GenerationBusy("generation pool was restarted, try again later") from None
+
+    def _abandon(self, future: Future):
+        """Proces z zawieszonym zadaniem nie wroci do puli - procesy zabijane, kolejne zadania na nowej puli"""
+        if future.cancel() or future.done():
+            # zadanie nie wystartowalo albo jego pula zostala juz zabita
+            return
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+
+    def generate(self, params: dict, timed: bool = False) -> bytes or tuple[bytes, list]:
+        """timed=True - (plik, czasy etapow) z build_dxf_timed"""
+        build = build_dxf_timed if timed else build_dxf
+        return self.result(self.submit(build, params, self.deterministic, self.time_budget))
+
+    async def _wait(self, future: Future):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            raise GenerationTimeout(f"generation exceeded {self.timeout} s")
+        except BrokenProcessPool:
+            raise GenerationBusy("generation pool was restarted, try again later") from None
+
+    async def generate_async(self, params: dict, timed: bool = False) -> bytes or tuple[bytes, list]:
+        """Jak generate, bez blokowania petli zdarzen; max_workers=0 - budowanie w puli watkow petli"""
+        build = build_dxf_timed if timed else build_dxf
+        if not self.max_workers:
+            return await asyncio.get_running_loop().run_in_executor(None, build, params, self.deterministic,
+                                                                    self.time_budget)
+        return await self._wait(self.submit(build, params, self.deterministic, self.time_budget))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
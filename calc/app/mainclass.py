@@ -1,16 +1,88 @@
 # Copyright (c) 2021-2022, Mogielski Mateusz - KONEC
 # Copyright (c) 2011-2022, Manfred Moitzi - EZDXF
+import io
 import math
-import re
-from typing import Literal
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import BinaryIO, Iterable, Iterator, Literal, Mapping
 import ezdxf
 import ezdxf.math
-from ezdxf import zoom
+from ezdxf.math import BoundingBox2d
+from ezdxf import bbox, zoom
+from ezdxf.document import CREATED_BY_EZDXF, Drawing
 from ezdxf.enums import TextEntityAlignment
 
 from calc.app.LANG.LANG_PL import LANG_PL
 from calc.app.LANG.LANG_DE import LANG_DE
 from calc.app.LANG.LANG_ENG import LANG_ENG
+from calc.app.bar_layout import spacing_between_bars
+from calc.app.cost import NO_WATCHDOG, Watchdog
+from calc.app.model import BeamModel
+from calc.app.steel_bill import SteelBill
+from calc.app.table import TableGrid
+from calc.app.template import DrawingTemplate, get_template, register_template
+from calc.app.timing import NULL_TIMER, StageTimer
+
+# wersja generatora - zmienic przy kazdej zmianie wygladu/zawartosci rysunku (uniewaznia cache DXF)
+GENERATOR_VERSION = '12'
+
+# napisy na rysunku wg jezyka; tylko do odczytu i wspolne dla wszystkich elementow, wiec rysunki w roznych
+# jezykach moga powstawac jednoczesnie w wielu watkach
+LANGUAGES = MappingProxyType({
+    'pl': MappingProxyType(dict(LANG_PL)),
+    'eng': MappingProxyType(dict(LANG_ENG)),
+    'de': MappingProxyType(dict(LANG_DE)),
+})
+
+# format zapisu DXF: nazwa w parametrach -> fmt ezdxf (binarny jest mniejszy i szybciej zapisywany)
+DXF_FORMATS = {'ascii': 'asc', 'binary': 'bin'}
+
+# tryb deterministyczny: stale daty, GUID i znaczniki ezdxf - te same parametry i wersja generatora daja
+# identyczne bajty pliku (cache HTTP, porownywanie plikow)
+FIXED_MARKER = f'{ezdxf.__version__} @ generator {GENERATOR_VERSION}'
+
+class _MetadataLock:
+    """
+    ezdxf.options jest wspolne dla procesu. Zapis deterministyczny wlacza opcje stalych metadanych,
+    wiec trwa na wylacznosc; zwykle zapisy (opcja wylaczona) ida rownolegle miedzy soba.
+    Czekajacy zapis deterministyczny wstrzymuje nowe zwykle zapisy, zeby nie czekal bez konca.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive and not self._waiting)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            self._condition.wait_for(lambda: not self._exclusive and not self._shared)
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+_metadata_lock = _MetadataLock()
 
 
 def point_position(x0: float, y0: float, distance: float, theta: float = 60) -> tuple[float, float]:
@@ -25,11 +97,66 @@ def tuple_dest(tuple_start: tuple[float, float], width: float = 0, height: float
     return tuple_start[0] + width, tuple_start[1] + height
 
 
-def spacing_between_bars(diameter: float, diameter_aggregate: float = 16) -> float:
-    return math.ceil(max(diameter, 20, diameter_aggregate + 5)) + diameter
-
+@contextmanager
+def drawing_metadata(drawing: Drawing, deterministic: bool = False):
+    """
+    Zapis rysunku (with drawing_metadata(drawing, deterministic): drawing.write(...)).
+    deterministic=True - metadane niezalezne od chwili zapisu: daty i GUID ($TDCREATE, $TDUPDATE,
+    $VERSIONGUID, $FINGERPRINTGUID) i znacznik zapisu ezdxf ustawia przy kazdym write(), stale daje jego
+    publiczna opcja write_fixed_meta_data_for_testing; znacznik utworzenia z ezdxf.new - ezdxf_metadata()
+    (uchwyty i $HANDSEED zaleza tylko od zawartosci rysunku)
+    """
+    if not deterministic:
+        # opcja nie jest przelaczana w trakcie zwyklego zapisu
+        with _metadata_lock.shared():
+            yield
+        return
+    with _metadata_lock.exclusive():
+        previous = ezdxf.options.write_fixed_meta_data_for_testing
+        drawing.ezdxf_metadata()[CREATED_BY_EZDXF] = FIXED_MARKER
+        ezdxf.options.write_fixed_meta_data_for_testing = True
+        try:
+            yield
+        finally:
+            ezdxf.options.write_fixed_meta_data_for_testing = previous
+
+
+def iter_chunks(data: bytes, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+# zasieg blokow opisow (bez skali), definicje blokow sa te same w kazdym rysunku
+_block_extents = {}
+
+
+def block_number(value: float) -> str:
+    """Wymiar w nazwie bloku: krotko (:g), a gdy :g zaokragla - dokladnie (repr), rozne wymiary - rozne bloki"""
+    short = f'{value:g}'
+    return short if float(short) == value else repr(float(value))
+
+
+def uniform_runs(positions: list[float], tolerance: float = 1e-6) -> list[tuple[float, float, int]]:
+    """Podzial posortowanych polozen na odcinki o stalym rozstawie: (poczatek, rozstaw, ilosc)"""
+    runs = []
+    i = 0
+    while i < len(positions):
+        if i + 1 == len(positions):
+            runs.append((positions[i], 0, 1))
+            break
+        spacing = positions[i + 1] - positions[i]
+        j = i + 1
+        while j + 1 < len(positions) and abs(positions[j + 1] - positions[j] - spacing) <= tolerance:
+            j += 1
+        runs.append((positions[i], spacing, j - i + 1))
+        i = j + 1
+    return runs
+
+
+class DxfElement(BeamModel):
+    """Rysunek belki (widok, przekroj, strzemie, wykaz zbrojenia) na podstawie BeamModel"""
 
-class DxfElement:
     def __init__(self,
                  beam_span: float,
                  beam_height: float,
@@ -60,42 +187,34 @@ class DxfElement:
                  dxfversion: str = 'R2018',
                  start_point_x: float = 0,
                  start_point_y: float = 0,
-                 language: str = 'pl') -> object:
-
-        self.first_row_stirrup_spacing_right = self._is_valid_value(first_row_stirrup_spacing_right, 0, 400)
-        self.first_row_stirrup_spacing_left = self._is_valid_value(first_row_stirrup_spacing_left, 0, 400)
-        self.first_row_stirrup_range_right = self._is_valid_value(first_row_stirrup_range_right, 0, 15000)
-        self.first_row_stirrup_range_left = self._is_valid_value(first_row_stirrup_range_left, 0, 15000)
-        self.name = self._is_valid_path_name(name)
-        self.number_of_elements = self._is_valid_value(number_of_elements, 1, 1000)
-        self.cover_right = self._is_valid_value(cover_right, 5, 100)
-        self.cover_left = self._is_valid_value(cover_left, 5, 100)
-        self.beam_width = self._is_valid_value(beam_width, 100, 1000)
-        self.cover_top = self._is_valid_value(cover_top, 5, 100)
-        self.cover_bottom = self._is_valid_value(cover_bottom, 5, 100)
-        self.cover_view_right = self._is_valid_value(cover_view_right, 5, 100)
-        self.cover_view_left = self._is_valid_value(cover_view_left, 5, 100)
-        self.diameter_main_bottom = self._is_valid_value(diameter_main_bottom, 1, 100)
-        self.quantity_main_top = self._is_valid_value(quantity_main_top, 1, 40)
-        self.steel_grade_main_top = self._is_valid_path_name(steel_grade_main_top)
-        self.diameter_main_top = self._is_valid_value(diameter_main_top, 1, 100)
-        self.quantity_main_bottom = self._is_valid_value(quantity_main_bottom, 1, 40)
-        self.steel_grade_main_bottom = self._is_valid_path_name(steel_grade_main_bottom)
-        self.diameter_stirrup = self._is_valid_value(diameter_stirrup, 1, 100)
-        self.steel_grade_stirrup = self._is_valid_path_name(steel_grade_stirrup)
+                 language: str = 'pl',
+                 format: str = 'ascii',
+                 drawing: Drawing = None,
+                 timer: StageTimer = None,
+                 deterministic: bool = False,
+                 watchdog: Watchdog = None) -> object:
+
+        super().__init__(beam_span=beam_span, beam_height=beam_height, beam_width=beam_width,
+                         width_support_left=width_support_left, width_support_right=width_support_right,
+                         diameter_main_top=diameter_main_top, quantity_main_top=quantity_main_top,
+                         steel_grade_main_top=steel_grade_main_top, diameter_main_bottom=diameter_main_bottom,
+                         quantity_main_bottom=quantity_main_bottom, steel_grade_main_bottom=steel_grade_main_bottom,
+                         diameter_stirrup=diameter_stirrup, steel_grade_stirrup=steel_grade_stirrup,
+                         cover_view_left=cover_view_left, cover_view_right=cover_view_right, cover_bottom=cover_bottom,
+                         cover_top=cover_top, cover_left=cover_left, cover_right=cover_right,
+                         first_row_stirrup_range_left=first_row_stirrup_range_left,
+                         first_row_stirrup_range_right=first_row_stirrup_range_right,
+                         first_row_stirrup_spacing_left=first_row_stirrup_spacing_left,
+                         first_row_stirrup_spacing_right=first_row_stirrup_spacing_right,
+                         secondary_stirrup_spacing=secondary_stirrup_spacing, number_of_elements=number_of_elements,
+                         name=name)
         self.start_point_y = start_point_y
         self.start_point_x = start_point_x
-        self.width_support_right = self._is_valid_value(width_support_right, 50, 1000)
-        self.width_support_left = self._is_valid_value(width_support_left, 50, 1000)
-        self.beam_span = self._is_valid_value_beam(beam_span, first_row_stirrup_range_left,
-                                                   first_row_stirrup_range_right, 300, 15000)
-        self.beam_height = self._is_valid_value(beam_height, 100, 1500)
         self.language = self._is_valid_path_name(language)
+        self.format = self._is_valid_format(format)
 
-        self.secondary_stirrup_spacing = math.floor(
-            min(0.75 * self.beam_height * 0.9, self._is_valid_value(secondary_stirrup_spacing, 0, 400)) / 5) * 5
         self.dimension_points = [0.0, float(self.beam_span)]
-        self.number_of_stirrups_of_the_second_row = None
+        self.bar_points = {}
 
         self.counter = None
         self.bar = None
@@ -106,71 +225,63 @@ class DxfElement:
         self.dim_name = None
         self.dim_name_bar = None
         self.text = None
-        self.steel_bill = []
-        self.count_stirrups = 0
         self.position = {}
+        # zasieg rysunku liczony przy rysowaniu, do ustawienia widoku bez przegladania wszystkich obiektow
+        self.extents = BoundingBox2d()
 
         self.dxfversion = dxfversion
-        self.language_choice()
-        self.drawing = ezdxf.new(dxfversion=self.dxfversion, setup=["linetypes"])
-        self.initial_drawing()
-        self.layer_element()
+        self.lang = self.language_choice()
+        self.timer = timer or NULL_TIMER
+        self.deterministic = deterministic
+        self.watchdog = watchdog or NO_WATCHDOG
+        stage = self._stage
+        with stage('layer_element'):
+            if drawing is not None:
+                # kolejny element na wspolnym rysunku, zasoby juz sa w dokumencie
+                self.drawing = drawing
+            else:
+                # kazdy rysunek z szablonu, takze pierwszy w procesie - te same parametry, ten sam plik
+                self.drawing = self._template().new_document()
+            self.layer_element(create=False)
         self._start_points(start_y=-2*self.beam_height)
         self.msp = self.drawing.modelspace()
-        self.beam_outline()
-        self.view_top_bar(quantity_bar=int(self.quantity_main_top), steel_grade=self.steel_grade_main_top)
-        self.view_top_bar(quantity_bar=int(self.quantity_main_top), steel_grade=self.steel_grade_main_top, dimension=True)
-        self.view_bottom_bar(quantity_bar=int(self.quantity_main_bottom), steel_grade=self.steel_grade_main_bottom)
-        self.view_bottom_bar(quantity_bar=int(self.quantity_main_bottom), steel_grade=self.steel_grade_main_bottom, dimension=True)
-        self._secondary_stirrup_spacing_min()
-        self.layout_new()
-        self.stirrup_spacing()
-        self.dimension_main()
-        self.dimension_stirrup()
-        self.beam_section_rectangular()
-        self.view_stirrups_type_2()
-        self.create_table(steel_bill=self.steel_bill)
-        self.generate_block()
+        with stage('view_bar'):
+            self.beam_outline()
+            self.view_top_bar(quantity_bar=int(self.quantity_main_top), steel_grade=self.steel_grade_main_top)
+            self.view_top_bar(quantity_bar=int(self.quantity_main_top), steel_grade=self.steel_grade_main_top, dimension=True)
+            self.view_bottom_bar(quantity_bar=int(self.quantity_main_bottom), steel_grade=self.steel_grade_main_bottom)
+            self.view_bottom_bar(quantity_bar=int(self.quantity_main_bottom), steel_grade=self.steel_grade_main_bottom, dimension=True)
+        with stage('layout'):
+            self.layout_new()
+        with stage('stirrup_spacing'):
+            self.stirrup_spacing()
+        with stage('dimension_main'):
+            self.dimension_main()
+        with stage('dimension_stirrup'):
+            self.dimension_stirrup()
+        with stage('section'):
+            self.beam_section_rectangular()
+            self.view_stirrups_type_2()
+        with stage('create_table'):
+            self.create_table(steel_bill=self.steel_bill)
+        with stage('generate_block'):
+            self.generate_block()
         # self.save()
 
-    @staticmethod
-    def _is_valid_value(value: float or int, min_value: float = 0, max_value: float = 99999):
-        if not isinstance(value, (int, float)) or value < min_value or value > max_value:
-            raise ValueError(f"{value} max is {max_value}[mm]")
-        return value
-
-    @staticmethod
-    def _is_valid_value_beam(value: float, range_left: float, range_right: float, min_value: float = 0,
-                             max_value: float = 99999) -> float or ValueError:
-        if not isinstance(value, (int, float)) or value <= min_value or value > max_value or value - range_left - range_right < 0:
-            raise ValueError(f"{value} max is {max_value}[mm]")
-        return value
-
-    @staticmethod
-    def _is_valid_path_name(name: str) -> str or ValueError:
-        """todo: poprawić regex, bo wywala błąd"""
-        # regex = "^(?:[^/]*(?:/(?:/[^/]*/?)?)?([^?]+)(?:\??.+)?)$"
-        regex = "/\\:*?\"<>|"
-        if not re.match(regex, name) or name.__len__() > 20:
-            raise ValueError("name is not regular expression for os")
-        return name
-
-    @staticmethod
-    def bar_bending(diameter: float) -> float:
-        """Obliczanie wygięcia pręta związanego ze średnicą pręta"""
-        if diameter <= 16:
-            return diameter * 2.5
-        else:
-            return diameter * 4.0
-
-    @staticmethod
-    def mass_1m_bar(diameter: float, mass: float = 7850) -> float:
-        return round(mass * math.pi * ((diameter / 2) / 1000) ** 2, 3)
-
-    def _secondary_stirrup_spacing_min(self) -> float:
-        self.secondary_stirrup_spacing = math.floor(
-            min(self.secondary_stirrup_spacing, 400, int(self.beam_height * 0.75)) / 5) * 5
-        return self.secondary_stirrup_spacing
+    def _stage(self, name: str):
+        """Etap budowania: sprawdzenie budzetu czasu (watchdog) i pomiar czasu etapu"""
+        self.watchdog.check()
+        return self.timer.stage(name, self._entity_count)
+
+    def _template(self) -> DrawingTemplate:
+        """Szablon dla wersji DXF; pierwszy w procesie z dokumentu przygotowanego tylko jako zrodlo zasobow"""
+        template = get_template(self.dxfversion)
+        if template is None:
+            self.drawing = ezdxf.new(dxfversion=self.dxfversion, setup=["linetypes"])
+            self.initial_drawing()
+            self.layer_element()
+            template = register_template(self.dxfversion, self.drawing)
+        return template
 
     def initial_drawing(self, LTSCALE: int = 50, INSUNITS: int = 4, MEASUREMENT: int = 1):
         """
@@ -183,16 +294,13 @@ class DxfElement:
         self.drawing.header['$MEASUREMENT'] = MEASUREMENT
         return self.drawing
 
-    def language_choice(self):
-        global LANG
-        if self.language == 'pl':
-            LANG = LANG_PL
-        elif self.language == 'eng':
-            LANG = LANG_ENG
-        elif self.language == 'de':
-            LANG = LANG_DE
-        else:
-            LANG = LANG_ENG
+    def _entity_count(self) -> int:
+        """Liczba obiektow w dokumencie (wszystkie przestrzenie, bloki, tablice) - do pomiaru etapow"""
+        return len(self.drawing.entitydb) if hasattr(self, 'drawing') else 0
+
+    def language_choice(self) -> Mapping[str, str]:
+        """Tablica napisow dla jezyka elementu, nieznany jezyk - angielski"""
+        return LANGUAGES.get(self.language, LANGUAGES['eng'])
 
     def layer_element(self,
                       counter: str = 'KONEC-Obrys', color_counter: int = 3,
@@ -203,8 +311,8 @@ class DxfElement:
                       hidden: str = 'KONEC-Przerywana', color_hidden: int = 8,
                       dim_name: str = 'KONEC_1_20', dim_scale: int = 20,
                       dim_name_bar: str = 'KONEC_BAR_1_20',
-                      text: str = 'KONEC-Tekst', font_text: str = 'Arial.ttf'):
-        """Tworzenie warstw, styli teksty i wymiarowania"""
+                      text: str = 'KONEC-Tekst', font_text: str = 'Arial.ttf', create: bool = True):
+        """Tworzenie warstw, styli teksty i wymiarowania. create=False - tylko nazwy, zasoby sa juz w szablonie"""
         self.counter = counter
         self.bar = bar
         self.stirrup = stirrup
@@ -214,6 +322,8 @@ class DxfElement:
         self.dim_name = dim_name
         self.dim_name_bar = dim_name_bar
         self.text = text
+        if not create:
+            return
 
         self.drawing.layers.new(self.counter, dxfattribs={'color': color_counter})
         self.drawing.layers.new(bar, dxfattribs={'color': color_bar})
@@ -256,16 +366,72 @@ class DxfElement:
         # bending_schedule
         self.position['bending_schedule'] = (start_x + beam + 300, start_y - 300)
 
-    def save(self, filepath):
-        """Zapisywanie do pliku"""
-        zoom.extents(self.msp, factor=1.1)
-        self.drawing.saveas(filepath)
+    def drawing_width(self) -> float:
+        """Szerokosc rysunku elementu (widok, przekroj, strzemie, wykaz zbrojenia) od start_point_x"""
+        return max(self.position['bending_schedule_end'][0],
+                   self.position['stirrup'][0] + self.beam_width + 1000) - self.start_point_x
+
+    def extend_extents(self, points: Iterable):
+        """Punkty (x, y, ...) dodawanych obiektow - rozszerzenie zasiegu rysunku"""
+        self.extents.extend((point[0], point[1]) for point in points)
+
+    def _extend_text_extents(self, insert: tuple, height: float, text: str, align: TextEntityAlignment):
+        """Przyblizony zasieg tekstu (szerokosc znaku ~ wysokosc)"""
+        x, y = insert[:2]
+        width = len(text) * height
+        if align == TextEntityAlignment.BOTTOM_CENTER:
+            self.extend_extents([(x - width / 2, y), (x + width / 2, y + height)])
+        else:
+            self.extend_extents([(x - width / 2, y - height / 2), (x + width / 2, y + height / 2)])
+
+    def _extend_block_extents(self, name: str, position: tuple, scale: float):
+        if name not in _block_extents:
+            _block_extents[name] = bbox.extents(self.drawing.blocks.get(name))
+        extents = _block_extents[name]
+        if extents.has_data:
+            self.extend_extents([(position[0] + extents.extmin.x * scale, position[1] + extents.extmin.y * scale),
+                                 (position[0] + extents.extmax.x * scale, position[1] + extents.extmax.y * scale)])
+
+    def zoom(self, factor: float = 1.1):
+        """Widok na caly rysunek z zasiegu liczonego przy rysowaniu, bez niego przeglad wszystkich obiektow"""
+        if self.extents.has_data:
+            zoom.center(self.msp, self.extents.center, self.extents.size * factor)
+        else:
+            zoom.extents(self.msp, factor=factor)
 
-    def bar_bulge(self, diameter):
-        """funkcja potrzebna aby wyliczyć promień łuku dla wyoblenia"""
-        bulge = self.bar_bending(diameter)
-        math_bulge = ezdxf.math.arc_to_bulge((bulge, 0), math.pi, math.pi / 2, bulge)
-        return -1 / math_bulge[2]
+    @staticmethod
+    def _is_valid_format(format: str) -> str or ValueError:
+        if format not in DXF_FORMATS:
+            raise ValueError(f"format {format} is not one of {', '.join(DXF_FORMATS)}")
+        return format
+
+    def save(self, filepath, format: str = None):
+        """Zapisywanie do pliku, format - 'ascii' albo 'binary' (domyslnie format elementu)"""
+        with self._stage('save'), drawing_metadata(self.drawing, self.deterministic):
+            self.zoom()
+            self.drawing.saveas(filepath, fmt=DXF_FORMATS[self._is_valid_format(format or self.format)])
+
+    def write(self, stream: BinaryIO, format: str = None):
+        """Zapisywanie do strumienia binarnego (np. BytesIO), bez plikow tymczasowych"""
+        with self._stage('save'), drawing_metadata(self.drawing, self.deterministic):
+            self.zoom()
+            if DXF_FORMATS[self._is_valid_format(format or self.format)] == 'bin':
+                # DXF binarny - liczby zapisywane bez zamiany na tekst
+                self.drawing.write(stream, fmt='bin')
+                return
+            text_stream = io.TextIOWrapper(stream, encoding=self.drawing.output_encoding, errors='dxfreplace')
+            self.drawing.write(text_stream)
+            text_stream.flush()
+            text_stream.detach()
+
+    def to_bytes(self, format: str = None) -> bytes:
+        stream = io.BytesIO()
+        self.write(stream, format)
+        return stream.getvalue()
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Gotowy plik DXF w kawalkach, np. dla StreamingHttpResponse"""
+        return iter_chunks(self.to_bytes(), chunk_size)
 
     def beam_outline(self):
         """generowanie obrysu belki"""
@@ -279,6 +445,7 @@ class DxfElement:
                    start_point_y + self.beam_height),
                   (start_point_x, start_point_y + self.beam_height)]
         self.msp.add_lwpolyline(points, dxfattribs={'closed': True, 'layer': self.counter})
+        self.extend_extents(points)
 
         self.supports(start_point_x, start_point_x + self.width_support_left)
         self.supports(start_point_x + self.width_support_left + self.beam_span,
@@ -289,35 +456,6 @@ class DxfElement:
         self.generate_marker_section(
             (start_point_x + self.width_support_left + self.beam_span / 2, start_point_y - 500), 'a')
 
-    def length_bar(self, points: list, diameter: float, angle: int = 90) -> float:
-        """angle jest to kąt pod jakim zmieniają się proste"""
-        arc_radius = self.bar_bending(diameter)
-        total_length_bar = 0
-        for i in range(len(points) - 1):
-            if len(points[i]) == 5:
-                total_length_bar += 2 * (angle / 360) * math.pi * arc_radius
-                continue
-            total_length_bar += ((points[i][0] - points[i + 1][0]) ** 2 + (points[i][1] - points[i + 1][1]) ** 2) ** 0.5
-        return round(total_length_bar)
-
-    def list_bar(self, points: tuple[float, float], diameter: float = None, quantity_bar: int = None,
-                 length: float = None, steel_grade: str = None,
-                 name: str = None):
-        self.steel_bill = [dict(t) for t in {tuple(d.items()) for d in self.steel_bill}]
-
-        bar = {
-            'name_element': self.name if name is None else self._is_valid_path_name(name),
-            'number': len(self.steel_bill) + 1,
-            'diameter': diameter,
-            'quantity_bar': quantity_bar,
-            'length': length,
-            'steel_grade': steel_grade,
-            'points_generate': points,
-        }
-        # todo: można dodać sortowanie po 'name_element' potem po 'number'
-        self.steel_bill.append(bar)
-        self.steel_bill.sort(key=(lambda x: x['number']))
-
     def view_top_bar(self, quantity_bar: int, steel_grade: str, dimension: bool = False, start_point_x: float = None,
                      start_point_y: float = None):
         """generowanie pręta górnego"""
@@ -327,42 +465,12 @@ class DxfElement:
         if start_point_y is None:
             start_point_y = self.position['main_bar_top'][1] if dimension else self.position['main_beam'][1]
 
-        bugle = self.bar_bulge(self.diameter_main_top)
-        bending = self.bar_bending(self.diameter_main_top)
-        points = [((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top),
-                   start_point_y + self.cover_bottom, self.diameter_main_top,
-                   self.diameter_main_top),
-                  ((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top),
-                   (
-                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top - bending),
-                   self.diameter_main_top, self.diameter_main_top, bugle),
-                  ((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top + bending),
-                   (
-                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top),
-                   self.diameter_main_top,
-                   self.diameter_main_top),
-                  ((
-                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top - bending),
-                   (
-                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top),
-                   self.diameter_main_top,
-                   self.diameter_main_top, bugle),
-                  ((
-                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top),
-                   (
-                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top - bending),
-                   self.diameter_main_top, self.diameter_main_top),
-                  ((
-                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top),
-                   start_point_y + self.cover_bottom)]
+        points = self.top_bar_points(start_point_x, start_point_y)
         self.msp.add_lwpolyline(points, dxfattribs={'closed': False, 'layer': self.bar})
-
-        length_bar = self.length_bar(points=points, diameter=self.diameter_main_top)
+        self.extend_extents(points)
 
         if dimension:
-            self.list_bar(diameter=self.diameter_main_top, quantity_bar=quantity_bar, length=length_bar,
-                          steel_grade=steel_grade,
-                          points=(points[0][0] + (points[-1][0] - points[0][0]) / 2, points[3][1]))
+            self.bill_top['points_generate'] = (points[0][0] + (points[-1][0] - points[0][0]) / 2, points[3][1])
             half = 0.5 * self.diameter_main_top
             self.dimension_generator(
                 (points[0][0] - 25, points[0][1]), points[0][:2], (points[2][0], points[2][1] + half), angle=90,
@@ -386,94 +494,50 @@ class DxfElement:
         if start_point_y is None:
             start_point_y = self.position['main_bar_bottom'][1] if dimension else self.position['main_beam'][1]
 
-        points = [((start_point_x + self.cover_view_left),
-                   (start_point_y + self.cover_bottom + self.diameter_stirrup + 0.5 * self.diameter_main_bottom),
-                   self.diameter_main_bottom, self.diameter_main_bottom),
-                  (
-                      start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right,
-                      (start_point_y + self.cover_bottom + self.diameter_stirrup + 0.5 * self.diameter_main_bottom))]
+        points = self.bottom_bar_points(start_point_x, start_point_y)
         self.msp.add_lwpolyline(points, dxfattribs={'closed': False, 'layer': self.bar})
-
-        length_bar = self.length_bar(points=points, diameter=self.diameter_main_bottom)
+        self.extend_extents(points)
 
         if dimension:
-            self.list_bar(diameter=self.diameter_main_bottom, quantity_bar=quantity_bar, length=length_bar,
-                          steel_grade=steel_grade,
-                          points=(points[0][0] + (points[-1][0] - points[0][0]) / 2, points[0][1]))
+            self.bill_bottom['points_generate'] = (points[0][0] + (points[-1][0] - points[0][0]) / 2, points[0][1])
             self.dimension_generator(
                 (points[0][0], points[0][1] - 100), points[0][:2], points[1][:2], dimstyle=self.dim_name_bar
             )
 
-    def distance_from_supports(self, distance: float) -> float:
-        value = 0
-
-        if self.first_row_stirrup_range_left != 0 and self.first_row_stirrup_spacing_left != 0:
-            value += math.ceil(
-                self.first_row_stirrup_range_left / self.first_row_stirrup_spacing_left) * self.first_row_stirrup_spacing_left
-        else:
-            value += 0
-
-        if self.first_row_stirrup_range_right != 0 and self.first_row_stirrup_spacing_right != 0:
-            value += math.ceil(
-                self.first_row_stirrup_range_right / self.first_row_stirrup_spacing_right) * self.first_row_stirrup_spacing_right
-        else:
-            value += 0
-
-        return self.beam_span - (value + math.floor((self.beam_span - value) / distance) * distance)
-
     def stirrup_spacing(self):
         """rozstaw strzemion w belce"""
-        last_stirrup_left: float = 0
-        last_stirrup_right: float = self.beam_span
-        localization_stirrups = []
         start_point_x, start_point_y = self.position['main_beam']
-        range_first_row = self.distance_from_supports(self.secondary_stirrup_spacing)
-
-        while range_first_row > 60:
-            self.secondary_stirrup_spacing -= 5
-            range_first_row = self.distance_from_supports(self.secondary_stirrup_spacing)
-
-        if self.first_row_stirrup_range_left != 0 and self.first_row_stirrup_spacing_left != 0:
-            for i in range(int(math.ceil(self.first_row_stirrup_range_left / self.first_row_stirrup_spacing_left) + 1)):
-                localization_stirrups.append(range_first_row / 2 + i * self.first_row_stirrup_spacing_left)
-            last_stirrup_left = localization_stirrups[-1]
-            self.dimension_points.append(last_stirrup_left)
-
-        if self.first_row_stirrup_range_right != 0 and self.first_row_stirrup_spacing_right != 0:
-            for i in range(
-                    int(math.ceil(self.first_row_stirrup_range_right / self.first_row_stirrup_spacing_right) + 1)):
-                localization_stirrups.append(
-                    self.beam_span - range_first_row / 2 - i * self.first_row_stirrup_spacing_right)
-            last_stirrup_right = localization_stirrups[-1]
-            self.dimension_points.append(last_stirrup_right)
+        layout = self.stirrup_layout
 
-        self.dimension_points.append(range_first_row / 2)
-        self.dimension_points.append(self.beam_span - range_first_row / 2)
+        for zone in layout.zones:
+            if zone.name != 'middle':
+                self.dimension_points.append(zone.end)
+        self.dimension_points.append(layout.end_distance)
+        self.dimension_points.append(self.beam_span - layout.end_distance)
 
         self.dimension_points = list(dict.fromkeys(self.dimension_points))
         self.dimension_points.sort()
 
-        for i in range(int((self.beam_span - last_stirrup_left - (
-                (
-                        self.beam_span - last_stirrup_right) if last_stirrup_right > 0 else 0)) / self.secondary_stirrup_spacing) + 1):
-            localization_stirrups.append((
-                                             last_stirrup_left if last_stirrup_left > 0 else range_first_row / 2) + i * self.secondary_stirrup_spacing)
-
-        localization_stirrups = list(dict.fromkeys(localization_stirrups))
-        localization_stirrups.sort()
-
-        self.number_of_stirrups_of_the_second_row = math.ceil(
-            (last_stirrup_right - last_stirrup_left) / self.secondary_stirrup_spacing)
-
-        for i in localization_stirrups:
-            points_stirrups = [
-                (
-                    (start_point_x + self.width_support_left + i), start_point_y + self.cover_bottom,
-                    self.diameter_stirrup,
-                    self.diameter_stirrup),
-                ((start_point_x + self.width_support_left + i), start_point_y + (self.beam_height - self.cover_top))]
-            self.msp.add_lwpolyline(points_stirrups, dxfattribs={'layer': self.stirrup})
-        self.count_stirrups = len(localization_stirrups)
+        localization_stirrups = layout.positions
+
+        # jeden blok strzemienia, kazdy odcinek o stalym rozstawie jako MINSERT (kolumny co rozstaw)
+        block_name = self._block_stirrup_view()
+        for start, spacing, count in uniform_runs(localization_stirrups):
+            insert = self.msp.add_blockref(
+                block_name, (start_point_x + self.width_support_left + start, start_point_y + self.cover_bottom),
+                dxfattribs={'layer': self.stirrup})
+            if count > 1:
+                insert.dxf.column_count = count
+                insert.dxf.column_spacing = spacing
+
+    def _block_stirrup_view(self) -> str:
+        """Blok strzemienia w widoku (linia o szerokosci srednicy strzemienia), tworzony raz na dokument"""
+        height = self.beam_height - self.cover_top - self.cover_bottom
+        name = f'stirrup_view_{block_number(self.diameter_stirrup)}_{block_number(height)}'
+        if name not in self.drawing.blocks:
+            block = self.drawing.blocks.new(name)
+            block.add_lwpolyline([(0, 0, self.diameter_stirrup, self.diameter_stirrup), (0, height)])
+        return name
 
     def supports(self, value_left: float, value_right: float, height: int = 200, hatch_name: str = 'ANSI32'):
         start_point_x, start_point_y = self.position['main_beam']
@@ -494,11 +558,13 @@ class DxfElement:
                        (value_right + 200, start_point_y - height)]
 
         self.msp.add_lwpolyline(line_hidden, dxfattribs={'layer': self.hidden})
+        self.extend_extents(line_hidden)
 
     def dimension_generator(self, base: tuple, p1: tuple, p2: tuple, angle: float = 0, text: str = "<>",
                             dimstyle=None) -> object:
         if dimstyle is None:
             dimstyle = self.dim_name
+        self.extend_extents([base, p1, p2])
         return self.msp.add_linear_dim(base=base, p1=p1, p2=p2, angle=angle, dimstyle=dimstyle,
                                        dxfattribs={'layer': self.dimension},
                                        text=text)
@@ -630,76 +696,39 @@ class DxfElement:
             )
 
     def bar_section(self, diameter: float, point: list[tuple[float, float]]):
+        block_name = self._block_bar_section(diameter)
         for i in point:
-            self.msp.add_circle(i, diameter / 2, dxfattribs={"layer": self.bar})
-            self.msp.add_hatch(color=-1, dxfattribs={"layer": self.hatch}).paths.add_edge_path().add_arc(i,
-                                                                                                         diameter / 2)
+            self.msp.add_blockref(block_name, i, dxfattribs={"layer": self.bar})
+
+    def _block_bar_section(self, diameter: float) -> str:
+        """Blok preta w przekroju (okrag + wypelnienie) dla danej srednicy, tworzony raz na dokument"""
+        name = f'bar_section_{block_number(diameter)}'
+        if name not in self.drawing.blocks:
+            block = self.drawing.blocks.new(name)
+            block.add_circle((0, 0), diameter / 2, dxfattribs={"layer": self.bar})
+            block.add_hatch(color=-1, dxfattribs={"layer": self.hatch}).paths.add_edge_path().add_arc((0, 0),
+                                                                                                       diameter / 2)
+        return name
 
     def localization_bar_section(self, localization: Literal['top', 'bottom']) -> list[tuple[float, float]]:
+        if localization in self.bar_points:
+            return self.bar_points[localization]
         start_point_x, start_point_y = self.position['section']
-        bar = {}
         turn = 1
-        list_points = []
-        center = 0
         if localization == 'top':
-            bar = self.steel_bill[0]
             start_point_y += self.beam_height
             turn = -1
-            center = self.cover_top + self.diameter_stirrup + bar['diameter'] / 2
-        elif localization == 'bottom':
-            bar = self.steel_bill[1]
-            center = self.cover_bottom + self.diameter_stirrup + bar['diameter'] / 2
-
-        bending = self.bar_bending(self.diameter_stirrup)
-        first_bar_horizontal = (
-            self.cover_left + self.diameter_stirrup / 2 + bending,
-            self.beam_width - self.cover_right - self.diameter_stirrup / 2 - bending) \
-            if bending - self.diameter_stirrup / 2 >= bar['diameter'] / 2 \
-            else (
-            self.cover_left + self.diameter_stirrup + bar['diameter'] / 2,
-            self.beam_width - self.cover_right - self.diameter_stirrup - bar['diameter'] / 2)
-
-        value = spacing_between_bars(bar['diameter'])
-
-        count_bar_next_line = 0
-        while (first_bar_horizontal[1] - first_bar_horizontal[0]) / (
-                bar['quantity_bar'] - count_bar_next_line - 1) < value:
-            count_bar_next_line += 1
-
-        spacing_first_line = first_bar_horizontal[1] - first_bar_horizontal[0]
-        first_line = bar['quantity_bar'] - count_bar_next_line
-
-        for i in range(first_line):
-            list_points.append(
-                (start_point_x + first_bar_horizontal[0] + spacing_first_line / (first_line - 1) * i,
-                 start_point_y + turn * center))
-
-        if count_bar_next_line > 0:
-            if count_bar_next_line == 1:
-                list_points.append(
-                    (start_point_x + self.cover_left + self.diameter_stirrup + bar['diameter'] / 2,
-                     start_point_y + turn * (center + value)))
-            else:
-                second_bar_horizontal = (
-                    self.cover_left + self.diameter_stirrup + bar['diameter'] / 2,
-                    self.beam_width - self.cover_left - self.diameter_stirrup - bar['diameter'] / 2
-                )
-                spacing_second_line = second_bar_horizontal[1] - second_bar_horizontal[0]
-                if (second_bar_horizontal[1] - second_bar_horizontal[0]) / (count_bar_next_line if count_bar_next_line == 1 else count_bar_next_line - 1) >= value:
-                    for i in range(count_bar_next_line):
-                        list_points.append((start_point_x + second_bar_horizontal[0] + spacing_second_line / (count_bar_next_line - 1) * i, start_point_y + turn * (center + value)))
-                else:
-                    self.msp.add_text("Nie poprawny rozstaw prętów, zmień przekrój belki lub prętów!!", dxfattribs={'height': 500, 'style': self.text})\
-                        .set_placement((start_point_x + self.beam_span, start_point_y + 2 * self.beam_height), align=TextEntityAlignment.MIDDLE_CENTER)
-
-        return list_points
+
+        self.bar_points[localization] = self.bar_layout(localization).points(start_point_x, start_point_y, turn)
+        return self.bar_points[localization]
 
     def beam_section_rectangular(self):
         start_point_x, start_point_y = self.position['section']
 
+        insert = (start_point_x + self.beam_height / 2, start_point_y + self.beam_height + 200)
         self.msp.add_text('A-A', dxfattribs={"height": 5 * 20, 'style': self.text, "layer": self.counter}) \
-            .set_placement((start_point_x + self.beam_height / 2, start_point_y + self.beam_height + 200),
-                           align=TextEntityAlignment.BOTTOM_CENTER)
+            .set_placement(insert, align=TextEntityAlignment.BOTTOM_CENTER)
+        self._extend_text_extents(insert, 5 * 20, 'A-A', TextEntityAlignment.BOTTOM_CENTER)
 
         points_beam_section = [(start_point_x, start_point_y),
                                (start_point_x + self.beam_width, start_point_y),
@@ -707,10 +736,18 @@ class DxfElement:
                                (start_point_x, start_point_y + self.beam_height)]
 
         self.msp.add_lwpolyline(points_beam_section, dxfattribs={'closed': True, 'layer': self.counter})
+        self.extend_extents(points_beam_section)
         self.view_stirrups_type_1(start_point_x, start_point_y)
 
         self.bar_section(self.diameter_main_bottom, self.localization_bar_section('bottom'))
         self.bar_section(self.diameter_main_top, self.localization_bar_section('top'))
+        if not self.bars_fit:
+            # jeden opis dla obu warstw - kazda osobno moze sie miescic, a razem nachodzic na siebie
+            text = self.BAR_LAYOUT_WARNING
+            insert = (start_point_x + self.beam_span, start_point_y + 2 * self.beam_height)
+            self.msp.add_text(text, dxfattribs={'height': 500, 'style': self.text})\
+                .set_placement(insert, align=TextEntityAlignment.MIDDLE_CENTER)
+            self._extend_text_extents(insert, 500, text, TextEntityAlignment.MIDDLE_CENTER)
         start_for_line = []
         for value, (x0, y0) in enumerate(self.localization_bar_section('top')):
             x1 = (x0 + (start_point_y + self.beam_height + 100 - y0) * math.tan(math.pi / 2 - math.radians(60)))
@@ -731,6 +768,8 @@ class DxfElement:
                   (start_point_y - 100))
                  ],
                 dxfattribs={'layer': self.counter})
+        self.extend_extents([(min(start_for_line), start_point_y - 100),
+                             (max(start_for_line), start_point_y + self.beam_height + 100)])
         self.msp.add_lwpolyline([(start_for_line[0], start_point_y + self.beam_height + 100),
                                  ((start_point_x + self.beam_width + 100), (start_point_y + self.beam_height + 100))],
                                 dxfattribs={'layer': self.counter})
@@ -766,53 +805,10 @@ class DxfElement:
 
     def view_stirrups_type_1(self, start_point_x: float, start_point_y: float, anchoring_stirrup: float = 80):
 
-        bending_stirrup = self.bar_bending(self.diameter_stirrup)
-        bending_arrow = self.bar_bulge(bending_stirrup)
-
-        points = [
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup - anchoring_stirrup,
-             self.diameter_stirrup, self.diameter_stirrup),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
-             self.diameter_stirrup, self.diameter_stirrup, bending_arrow),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup),
-            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup - bending_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup, bending_arrow),
-            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
-             self.diameter_stirrup, self.diameter_stirrup),
-            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup,
-             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup + bending_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup, bending_arrow),
-            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup - bending_stirrup,
-             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
-             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup, bending_arrow),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
-             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup + bending_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
-             self.diameter_stirrup, self.diameter_stirrup, bending_arrow),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup),
-            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup + anchoring_stirrup,
-             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
-             self.diameter_stirrup)
-        ]
-        length_bar = self.length_bar(points=points, diameter=self.diameter_stirrup)
-
-        self.list_bar(diameter=self.diameter_stirrup, quantity_bar=self.count_stirrups, length=length_bar,
-                      steel_grade=self.steel_grade_stirrup, points=(0, 0))
+        points = self.stirrup_points(start_point_x, start_point_y, anchoring_stirrup)
 
         self.msp.add_lwpolyline(points, dxfattribs={'layer': self.bar})
+        self.extend_extents(points)
 
     def view_stirrups_type_2(self, anchoring_stirrup: float = (10 * 8)):
         bending_stirrup = self.bar_bending(self.diameter_stirrup)
@@ -871,7 +867,9 @@ class DxfElement:
         ]
 
         self.msp.add_lwpolyline(points, dxfattribs={'layer': self.bar})
+        self.extend_extents(points)
 
+        self.extend_extents([(start_point_x, start_point_y - 50), (start_point_x + self.cover_left - 25, start_point_y)])
         self.msp.add_linear_dim((start_point_x, start_point_y - 50),
                                 (start_point_x + self.cover_left, start_point_y + self.cover_bottom), (
                                     start_point_x + self.beam_width - self.cover_right,
@@ -884,13 +882,13 @@ class DxfElement:
             (start_point_x + self.cover_left, start_point_y + self.beam_height - self.cover_top),
             dimstyle=self.dim_name_bar,
             dxfattribs={'layer': self.dimension}, angle=90, text='<>')
-        self.steel_bill[-1]['points_generate'] = (
+        self.bill_stirrup['points_generate'] = (
             start_point_x + self.beam_width - self.cover_right + 400, start_point_y + self.beam_height / 2 - 100)
 
     # def generate_cell(self, points: list[tuple[float, float]], scale: int = 20, text: str = "__"):
 
     def generate_cell(self, point_top_left: tuple[float, float], width: float, height: float, scale: int = 20,
-                      text: str = "__", height_text: float = 2.5, attachment_point: int = 5):
+                      text: str = "__", height_text: float = 2.5, attachment_point: int = 5, grid: TableGrid = None):
 
         """ MTEXT_TOP_LEFT          1
             MTEXT_TOP_CENTER        2
@@ -901,6 +899,7 @@ class DxfElement:
             MTEXT_BOTTOM_LEFT       7
             MTEXT_BOTTOM_CENTER     8
             MTEXT_BOTTOM_RIGHT      9
+            grid - krawedzie komorki trafiaja do TableGrid (rysowane razem w draw_grid), bez grid - prostokat
         """
 
         points = [point_top_left,
@@ -908,7 +907,13 @@ class DxfElement:
                   (point_top_left[0] + width * scale, point_top_left[1] - height * scale),
                   (point_top_left[0], point_top_left[1] - height * scale)]
 
-        self.msp.add_lwpolyline(points, dxfattribs={'closed': True, 'layer': self.counter})
+        self.extend_extents(points[::2])
+        if grid is None:
+            self.msp.add_lwpolyline(points, dxfattribs={'closed': True, 'layer': self.counter})
+        else:
+            grid.add_rectangle(*points[0], *points[2])
+        if text == '':
+            return
 
         if attachment_point == 5:
             location = (tuple(map(lambda x: sum(x) / float(len(x)), zip(*points[:3:2]))))
@@ -926,22 +931,12 @@ class DxfElement:
                                        'layer': self.counter}) \
             .set_location(location)
 
-    def create_table(self, steel_bill: list, scale: int = 20):
+    def create_table(self, steel_bill: SteelBill, scale: int = 20):
         start_point_x, start_point_y = self.position['bending_schedule']
 
-        steel_grade = {}
-        for i in steel_bill:
-            value_grade = i['steel_grade']
-            if value_grade not in steel_grade:
-                steel_grade[value_grade] = []
-
-        for i in steel_bill:
-            value_diameter = i['diameter']
-            value_grade = i['steel_grade']
-            for j in steel_grade:
-                if value_grade == j:
-                    if value_diameter not in steel_grade[value_grade]:
-                        steel_grade[value_grade].append(value_diameter)
+        schedule = steel_bill.schedule(self.number_of_elements, self.mass_1m_bar)
+        steel_grade = schedule.grades
+        grid = TableGrid()
 
         count_column = sum(len(value) for value in steel_grade.values())
         count_row = len(steel_bill)
@@ -950,90 +945,88 @@ class DxfElement:
         row_height = [10, 5, 5, 5, 5, 5 * count_row, 5]
 
         start_point = (start_point_x, start_point_y)
+        self.position['bending_schedule_end'] = (start_point_x + sum(column_width) * scale, start_point_y)
 
         # title
-        self.generate_cell(point_top_left=start_point, width=sum(column_width), height=row_height[0],
-                           text=LANG['bending_schedule'], height_text=5)
+        self.generate_cell(grid=grid, point_top_left=start_point, width=sum(column_width), height=row_height[0],
+                           text=self.lang['bending_schedule'], height_text=5)
         # header
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale),
                            width=column_width[0],
                            height=sum(row_height[1:4]),
-                           text=LANG['mark'])
+                           text=self.lang['mark'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale,
                                                      width=sum(column_width[:1]) * scale),
                            width=column_width[1],
                            height=sum(row_height[1:3]),
-                           text=LANG['dia'])
+                           text=self.lang['dia'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:3]) * scale,
                                                      width=sum(column_width[:1]) * scale),
                            width=column_width[1],
                            height=sum(row_height[3:4]),
-                           text=LANG['length_mm'])
+                           text=self.lang['length_mm'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale,
                                                      width=sum(column_width[:2]) * scale),
                            width=column_width[2],
                            height=sum(row_height[1:3]),
-                           text=LANG['length_bar'])
+                           text=self.lang['length_bar'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:3]) * scale,
                                                      width=sum(column_width[:2]) * scale),
                            width=column_width[2],
                            height=sum(row_height[3:4]),
-                           text=LANG['length_mm'])
+                           text=self.lang['length_mm'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale,
                                                      width=sum(column_width[:3]) * scale),
                            width=column_width[3],
                            height=sum(row_height[1:3]),
-                           text=LANG['number_in_element'])
+                           text=self.lang['number_in_element'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:3]) * scale,
                                                      width=sum(column_width[:3]) * scale),
                            width=column_width[3],
                            height=sum(row_height[3:4]),
-                           text=LANG['pcs'])
+                           text=self.lang['pcs'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale,
                                                      width=sum(column_width[:4]) * scale),
                            width=column_width[4],
                            height=sum(row_height[1:3]),
-                           text=LANG['total_number'])
+                           text=self.lang['total_number'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:3]) * scale,
                                                      width=sum(column_width[:4]) * scale),
                            width=column_width[4],
                            height=sum(row_height[3:4]),
-                           text=LANG['pcs'])
+                           text=self.lang['pcs'])
 
-        self.generate_cell(point_top_left=tuple_dest(start_point,
+        self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                      height=-sum(row_height[:1]) * scale,
                                                      width=sum(column_width[:5]) * scale),
                            width=column_width[5],
                            height=sum(row_height[3:4]),
-                           text=LANG['total_length'])
-
-        # nie należy tak tworzyć tablic, listy należy tworzyć przez list comprechention
-        # array_bending_schedule = count_column * [count_row * [0]]
+                           text=self.lang['total_length'])
 
-        array_bending_schedule = [['-' for i in range(count_column)] for j in range(count_row)]
+        array_bending_schedule = schedule.rows
         count_count_grade_value = 0
 
         for i in steel_grade:
             count_column_grade = column_width[5] * count_count_grade_value / count_column
 
-            self.generate_cell(point_top_left=tuple_dest(start_point,
+            self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                          height=-sum(row_height[:2]) * scale,
                                                          width=(sum(column_width[:5]) + count_column_grade) * scale),
                                width=column_width[5] / count_column * len(steel_grade[i]),
@@ -1041,7 +1034,7 @@ class DxfElement:
                                text=i)
 
             for j in range(len(steel_grade[i])):
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-sum(row_height[:3]) * scale,
                                                              width=(sum(column_width[
                                                                         :5]) + column_width[
@@ -1050,50 +1043,40 @@ class DxfElement:
                                    height=sum(row_height[4:5]),
                                    text=f'%%c{steel_grade[i][j]}')
 
-                for k in range(len(steel_bill)):
-                    if steel_bill[k]['steel_grade'] == i and steel_bill[k]['diameter'] == steel_grade[i][j]:
-                        array_bending_schedule[k][count_count_grade_value] = round(
-                            steel_bill[k]['length'] / 1000 * steel_bill[k]['quantity_bar'] * self.number_of_elements, 2)
-
                 count_count_grade_value += 1
 
         if column_width[6] > 0:
-            self.generate_cell(point_top_left=tuple_dest(start_point,
+            self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                          height=-sum(row_height[:1]) * scale,
                                                          width=sum(column_width[:6]) * scale),
                                width=column_width[6],
                                height=sum(row_height[1:4]),
-                               text=LANG['comments'])
+                               text=self.lang['comments'])
 
-        elements = []
-        for i in steel_bill:
-            value_element = i['name_element']
-            if value_element not in elements:
-                elements.append(value_element)
-        elements.sort()
+        elements = steel_bill.elements()
 
         for i in range(len(elements)):
-            self.generate_cell(point_top_left=tuple_dest(start_point,
+            self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                          height=-sum(row_height[:4]) * scale),
                                width=sum(column_width[:]),
                                height=sum(row_height[4:5]),
                                attachment_point=4,
-                               text=f"{LANG['element:']} {self.name}")
-            self.generate_cell(point_top_left=tuple_dest(start_point,
+                               text=f"{self.lang['element:']} {self.name}")
+            self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                          height=-sum(row_height[:4]) * scale),
                                width=sum(column_width[:]),
                                height=sum(row_height[4:5]),
                                attachment_point=6,
-                               text=f"{LANG['make']} {self.number_of_elements} {LANG['pcs']}")
+                               text=f"{self.lang['make']} {self.number_of_elements} {self.lang['pcs']}")
             for j in range(count_row):
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:5]) + row_height[
                                                                  5] * j / count_row) * scale),
                                    width=column_width[0],
                                    height=row_height[5] / count_row,
                                    text=steel_bill[j]['number'])
 
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:5]) + row_height[
                                                                  5] * j / count_row) * scale,
                                                              width=sum(column_width[:1]) * scale),
@@ -1102,7 +1085,7 @@ class DxfElement:
                                    height=row_height[5] / count_row,
                                    text=f"%%c {steel_bill[j]['diameter']}")
 
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:5]) + row_height[
                                                                  5] * j / count_row) * scale,
                                                              width=sum(column_width[:2]) * scale),
@@ -1111,7 +1094,7 @@ class DxfElement:
                                    height=row_height[5] / count_row,
                                    text=steel_bill[j]['length'])
 
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:5]) + row_height[
                                                                  5] * j / count_row) * scale,
                                                              width=sum(column_width[:3]) * scale),
@@ -1120,7 +1103,7 @@ class DxfElement:
                                    height=row_height[5] / count_row,
                                    text=steel_bill[j]['quantity_bar'])
 
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:5]) + row_height[
                                                                  5] * j / count_row) * scale,
                                                              width=sum(column_width[:4]) * scale),
@@ -1130,7 +1113,7 @@ class DxfElement:
                                    text=f"{steel_bill[j]['quantity_bar'] * self.number_of_elements}")
 
                 for k in range(count_column):
-                    self.generate_cell(point_top_left=tuple_dest(start_point,
+                    self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                                  height=-(sum(row_height[:5]) + row_height[
                                                                      5] * j / count_row) * scale,
                                                                  width=(sum(column_width[:5]) + column_width[
@@ -1141,7 +1124,7 @@ class DxfElement:
                                        text=f"{array_bending_schedule[j][k]}")
 
                 if column_width[6] > 0:
-                    self.generate_cell(point_top_left=tuple_dest(start_point,
+                    self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                                  height=-(sum(row_height[:5]) + row_height[
                                                                      5] * j / count_row) * scale,
                                                                  width=sum(column_width[:6]) * scale),
@@ -1149,43 +1132,25 @@ class DxfElement:
                                        height=row_height[5] / count_row,
                                        text='')
         # footer
-        array_total_mass = [[0 for i in range(count_column)] if j < 3 else [0] for j in range(4)]
-
-        for i in range(len(array_bending_schedule[0])):
-            for j in array_bending_schedule:
-                if type(j[i]) is float:
-                    array_total_mass[0][i] += j[i]
-
-        count_count_grade_value = 0
-        for i in steel_grade:
-            for j in range(len(steel_grade[i])):
-                for k in range(len(steel_bill)):
-                    if steel_bill[k]['steel_grade'] == i and steel_bill[k]['diameter'] == steel_grade[i][j]:
-                        array_total_mass[1][count_count_grade_value] = self.mass_1m_bar(steel_bill[k]['diameter'])
-                count_count_grade_value += 1
-
-        for i in range(len(array_total_mass[2])):
-            value = array_total_mass[0][i] * array_total_mass[1][i]
-            array_total_mass[2][i] = round(value, 1)
-            array_total_mass[3][0] += round(value, 1)
+        array_total_mass = [schedule.total_length, schedule.mass_1m, schedule.mass, (schedule.mass_total,)]
 
         array_footer = [
-            [(LANG['total_length_dia'], 4), (LANG['length_m'], 6)],
-            [(LANG['mass_1m'], 4), (LANG['mass_length'], 6)],
-            [(LANG['mass_according_dia'], 4), (LANG['mass'], 6)],
-            [[LANG['mass_total'], 4], (LANG['mass'], 6)]
+            [(self.lang['total_length_dia'], 4), (self.lang['length_m'], 6)],
+            [(self.lang['mass_1m'], 4), (self.lang['mass_length'], 6)],
+            [(self.lang['mass_according_dia'], 4), (self.lang['mass'], 6)],
+            [[self.lang['mass_total'], 4], (self.lang['mass'], 6)]
         ]
 
         for i in range(len(array_footer)):
             for j in range(len(array_footer[i])):
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:6]) + row_height[6] * i) * scale),
                                    height=row_height[6],
                                    width=sum(column_width[:5]),
                                    attachment_point=array_footer[i][j][1],
                                    text=f"{array_footer[i][j][0]}")
             for j in range(len(array_total_mass[i])):
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:6]) + row_height[6] * i) * scale,
                                                              width=(sum(column_width[:5]) + column_width[
                                                                  5] * j / count_column) * scale),
@@ -1194,14 +1159,19 @@ class DxfElement:
                                    attachment_point=6 if len(array_total_mass[i]) > 1 else 5,
                                    text=f"{round(array_total_mass[i][j], 3)}")
             if column_width[6] > 0:
-                self.generate_cell(point_top_left=tuple_dest(start_point,
+                self.generate_cell(grid=grid, point_top_left=tuple_dest(start_point,
                                                              height=-(sum(row_height[:6]) + row_height[6] * i) * scale,
                                                              width=sum(column_width[:6]) * scale),
                                    height=row_height[6],
                                    width=column_width[6],
                                    text='')
+        self.draw_grid(grid)
         # todo: dodać pod tabelą uwagi
 
+    def draw_grid(self, grid: TableGrid):
+        for start, end in grid.lines():
+            self.msp.add_lwpolyline([start, end], dxfattribs={'layer': self.counter})
+
     def _create_block_marker_section(self):
         name = 'marker_section'
         if name in self.drawing.blocks:
@@ -1247,19 +1217,26 @@ class DxfElement:
         block.add_attdef('LENGTH', dxfattribs={"height": 2.5, 'style': self.text, "layer": self.counter}).set_placement(
             (9, 5), align=TextEntityAlignment.MIDDLE_LEFT)
 
+    def insert_block(self, name: str, position: tuple, values: dict, scale: int = 20):
+        """
+        Wstawienie bloku z atrybutami (INSERT + ATTRIB), opisy zostaja edytowalne w programie CAD.
+        Bez bloku anonimowego z add_auto_blockref, ktory po explode() zostawal w pliku dla kazdego opisu.
+        """
+        self._extend_block_extents(name, position, scale)
+        return self.msp.add_blockref(name, position).set_scale(scale).add_auto_attribs(values)
+
     def generate_reinforcement_description(self, position: tuple, number: float or str, quantity: float or str,
                                            diameter: float or str,
                                            length: float or str, scale: int = 20):
-        self.msp.add_auto_blockref("reinforcement_description", position,
-                                   {"NUMBER": str(number), "QUANTITY": str(quantity), "DIAMETER": str(diameter),
-                                    "LENGTH": str(length)}).set_scale(scale).explode()
+        self.insert_block("reinforcement_description", position,
+                          {"NUMBER": str(number), "QUANTITY": str(quantity), "DIAMETER": str(diameter),
+                           "LENGTH": str(length)}, scale)
 
     def generate_marker_left(self, position: tuple, number: float or str, scale: int = 20):
-        self.msp.add_auto_blockref("marker", position, {"NUMBER": str(number)}).set_scale(scale).explode()
+        self.insert_block("marker", position, {"NUMBER": str(number)}, scale)
 
     def generate_marker_section(self, position: tuple, section: float or str, scale: int = 20):
-        self.msp.add_auto_blockref("marker_section", position, {"SECTION": str(section).upper()}).set_scale(
-            scale).explode()
+        self.insert_block("marker_section", position, {"SECTION": str(section).upper()}, scale)
 
     def generate_block(self):
         for i in self.steel_bill:
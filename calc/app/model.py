@@ -0,0 +1,331 @@
+import math
+import re
+
+from calc.app.bar_layout import BarLayout, solve_bar_layout
+from calc.app.spacing import solve_stirrup_spacing
+from calc.app.steel_bill import BendingSchedule, SteelBill
+
+
+class BeamModel:
+    """
+    Geometria i ilosci stali belki bez rysunku (bez ezdxf): polozenia strzemion, ksztalty pretow
+    (wierzcholki jak w LWPOLYLINE: x, y, szerokosc, szerokosc[, bulge]), uklad pretow w przekroju, wykaz stali.
+    DxfElement rysuje belke na podstawie tych danych.
+    """
+
+    # zakresy wartosci parametrow (min, max) sprawdzane przy tworzeniu modelu
+    LIMITS = {
+        'first_row_stirrup_spacing_right': (0, 400),
+        'first_row_stirrup_spacing_left': (0, 400),
+        'first_row_stirrup_range_right': (0, 15000),
+        'first_row_stirrup_range_left': (0, 15000),
+        'number_of_elements': (1, 1000),
+        'cover_right': (5, 100),
+        'cover_left': (5, 100),
+        'beam_span': (300, 15000),
+        'beam_width': (100, 1000),
+        'cover_top': (5, 100),
+        'cover_bottom': (5, 100),
+        'cover_view_right': (5, 100),
+        'cover_view_left': (5, 100),
+        'diameter_main_bottom': (1, 100),
+        'quantity_main_top': (1, 40),
+        'diameter_main_top': (1, 100),
+        'quantity_main_bottom': (1, 40),
+        'diameter_stirrup': (1, 100),
+        'width_support_right': (50, 1000),
+        'width_support_left': (50, 1000),
+        'beam_height': (100, 1500),
+        'secondary_stirrup_spacing': (0, 400),
+    }
+
+    # opis na rysunku i w quantities, gdy prety nie mieszcza sie w przekroju
+    BAR_LAYOUT_WARNING = "Nie poprawny rozstaw prętów, zmień przekrój belki lub prętów!!"
+
+    def __init__(self,
+                 beam_span: float,
+                 beam_height: float,
+                 beam_width: float,
+                 width_support_left: int,
+                 width_support_right: int,
+                 diameter_main_top: int,
+                 quantity_main_top: int,
+                 steel_grade_main_top: str,
+                 diameter_main_bottom: int,
+                 quantity_main_bottom: int,
+                 steel_grade_main_bottom: str,
+                 diameter_stirrup: int,
+                 steel_grade_stirrup: str,
+                 cover_view_left: int,
+                 cover_view_right: int,
+                 cover_bottom: int,
+                 cover_top: int,
+                 cover_left: int,
+                 cover_right: int,
+                 first_row_stirrup_range_left: int,
+                 first_row_stirrup_range_right: int,
+                 first_row_stirrup_spacing_left: int,
+                 first_row_stirrup_spacing_right: int,
+                 secondary_stirrup_spacing: int,
+                 number_of_elements: int = 1,
+                 name: str = "Belka"):
+
+        self.first_row_stirrup_spacing_right = self._is_valid_value(first_row_stirrup_spacing_right, *self.LIMITS['first_row_stirrup_spacing_right'])
+        self.first_row_stirrup_spacing_left = self._is_valid_value(first_row_stirrup_spacing_left, *self.LIMITS['first_row_stirrup_spacing_left'])
+        self.first_row_stirrup_range_right = self._is_valid_value(first_row_stirrup_range_right, *self.LIMITS['first_row_stirrup_range_right'])
+        self.first_row_stirrup_range_left = self._is_valid_value(first_row_stirrup_range_left, *self.LIMITS['first_row_stirrup_range_left'])
+        self.name = self._is_valid_path_name(name)
+        self.number_of_elements = self._is_valid_value(number_of_elements, *self.LIMITS['number_of_elements'])
+        self.cover_right = self._is_valid_value(cover_right, *self.LIMITS['cover_right'])
+        self.cover_left = self._is_valid_value(cover_left, *self.LIMITS['cover_left'])
+        self.beam_width = self._is_valid_value(beam_width, *self.LIMITS['beam_width'])
+        self.cover_top = self._is_valid_value(cover_top, *self.LIMITS['cover_top'])
+        self.cover_bottom = self._is_valid_value(cover_bottom, *self.LIMITS['cover_bottom'])
+        self.cover_view_right = self._is_valid_value(cover_view_right, *self.LIMITS['cover_view_right'])
+        self.cover_view_left = self._is_valid_value(cover_view_left, *self.LIMITS['cover_view_left'])
+        self.diameter_main_bottom = self._is_valid_value(diameter_main_bottom, *self.LIMITS['diameter_main_bottom'])
+        self.quantity_main_top = self._is_valid_value(quantity_main_top, *self.LIMITS['quantity_main_top'])
+        self.steel_grade_main_top = self._is_valid_path_name(steel_grade_main_top)
+        self.diameter_main_top = self._is_valid_value(diameter_main_top, *self.LIMITS['diameter_main_top'])
+        self.quantity_main_bottom = self._is_valid_value(quantity_main_bottom, *self.LIMITS['quantity_main_bottom'])
+        self.steel_grade_main_bottom = self._is_valid_path_name(steel_grade_main_bottom)
+        self.diameter_stirrup = self._is_valid_value(diameter_stirrup, *self.LIMITS['diameter_stirrup'])
+        self.steel_grade_stirrup = self._is_valid_path_name(steel_grade_stirrup)
+        self.width_support_right = self._is_valid_value(width_support_right, *self.LIMITS['width_support_right'])
+        self.width_support_left = self._is_valid_value(width_support_left, *self.LIMITS['width_support_left'])
+        self.beam_span = self._is_valid_value_beam(beam_span, first_row_stirrup_range_left,
+                                                   first_row_stirrup_range_right, *self.LIMITS['beam_span'])
+        self.beam_height = self._is_valid_value(beam_height, *self.LIMITS['beam_height'])
+
+        self.secondary_stirrup_spacing = math.floor(
+            min(0.75 * self.beam_height * 0.9, self._is_valid_value(secondary_stirrup_spacing, *self.LIMITS['secondary_stirrup_spacing'])) / 5) * 5
+
+        self._secondary_stirrup_spacing_min()
+        self.stirrup_layout = solve_stirrup_spacing(self.beam_span, self.secondary_stirrup_spacing,
+                                                    self.first_row_stirrup_range_left,
+                                                    self.first_row_stirrup_spacing_left,
+                                                    self.first_row_stirrup_range_right,
+                                                    self.first_row_stirrup_spacing_right)
+        self.secondary_stirrup_spacing = self.stirrup_layout.spacing
+        self.count_stirrups = len(self.stirrup_layout.positions)
+        self.number_of_stirrups_of_the_second_row = self.stirrup_layout.second_row_count
+        self.bar_layouts = {}
+
+        # pozycje wykazu: 1 - pret gorny, 2 - pret dolny, 3 - strzemie
+        self.steel_bill = SteelBill()
+        self.bill_top = self.steel_bill.add(
+            name_element=self.name, diameter=self.diameter_main_top, quantity_bar=int(self.quantity_main_top),
+            length=self.length_bar(self.top_bar_points(0, 0), self.diameter_main_top),
+            steel_grade=self.steel_grade_main_top)
+        self.bill_bottom = self.steel_bill.add(
+            name_element=self.name, diameter=self.diameter_main_bottom, quantity_bar=int(self.quantity_main_bottom),
+            length=self.length_bar(self.bottom_bar_points(0, 0), self.diameter_main_bottom),
+            steel_grade=self.steel_grade_main_bottom)
+        self.bill_stirrup = self.steel_bill.add(
+            name_element=self.name, diameter=self.diameter_stirrup, quantity_bar=self.count_stirrups,
+            length=self.length_bar(self.stirrup_points(0, 0), self.diameter_stirrup),
+            steel_grade=self.steel_grade_stirrup, points_generate=(0, 0))
+
+    @staticmethod
+    def _is_valid_value(value: float or int, min_value: float = 0, max_value: float = 99999):
+        if not isinstance(value, (int, float)) or value < min_value or value > max_value:
+            raise ValueError(f"{value} max is {max_value}[mm]")
+        return value
+
+    @staticmethod
+    def _is_valid_value_beam(value: float, range_left: float, range_right: float, min_value: float = 0,
+                             max_value: float = 99999) -> float or ValueError:
+        if not isinstance(value, (int, float)) or value <= min_value or value > max_value or value - range_left - range_right < 0:
+            raise ValueError(f"{value} max is {max_value}[mm]")
+        return value
+
+    @staticmethod
+    def _is_valid_path_name(name: str) -> str or ValueError:
+        """todo: poprawić regex, bo wywala błąd"""
+        # regex = "^(?:[^/]*(?:/(?:/[^/]*/?)?)?([^?]+)(?:\??.+)?)$"
+        regex = "/\\:*?\"<>|"
+        if not re.match(regex, name) or name.__len__() > 20:
+            raise ValueError("name is not regular expression for os")
+        return name
+
+    @staticmethod
+    def bar_bending(diameter: float) -> float:
+        """Obliczanie wygięcia pręta związanego ze średnicą pręta"""
+        if diameter <= 16:
+            return diameter * 2.5
+        else:
+            return diameter * 4.0
+
+    @staticmethod
+    def mass_1m_bar(diameter: float, mass: float = 7850) -> float:
+        return round(mass * math.pi * ((diameter / 2) / 1000) ** 2, 3)
+
+    def _secondary_stirrup_spacing_min(self) -> float:
+        self.secondary_stirrup_spacing = math.floor(
+            min(self.secondary_stirrup_spacing, 400, int(self.beam_height * 0.75)) / 5) * 5
+        return self.secondary_stirrup_spacing
+
+    @staticmethod
+    def bar_bulge(diameter: float) -> float:
+        """funkcja potrzebna aby wyliczyć promień łuku dla wyoblenia (luk 90st, jak ezdxf.math.arc_to_bulge)"""
+        start_angle, end_angle = math.pi, math.pi / 2
+        angle = math.fmod((math.pi * 2 + (end_angle - start_angle)), math.pi * 2) / 4.0
+        return -1 / (math.sin(angle) / math.cos(angle))
+
+    def length_bar(self, points: list, diameter: float, angle: int = 90) -> float:
+        """angle jest to kąt pod jakim zmieniają się proste"""
+        arc_radius = self.bar_bending(diameter)
+        total_length_bar = 0
+        for i in range(len(points) - 1):
+            if len(points[i]) == 5:
+                total_length_bar += 2 * (angle / 360) * math.pi * arc_radius
+                continue
+            total_length_bar += ((points[i][0] - points[i + 1][0]) ** 2 + (points[i][1] - points[i + 1][1]) ** 2) ** 0.5
+        return round(total_length_bar)
+
+    def top_bar_points(self, start_point_x: float, start_point_y: float) -> list[tuple]:
+        """Pret gorny w widoku, od punktu poczatkowego belki"""
+        bugle = self.bar_bulge(self.diameter_main_top)
+        bending = self.bar_bending(self.diameter_main_top)
+        points = [((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top),
+                   start_point_y + self.cover_bottom, self.diameter_main_top,
+                   self.diameter_main_top),
+                  ((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top),
+                   (
+                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top - bending),
+                   self.diameter_main_top, self.diameter_main_top, bugle),
+                  ((start_point_x + self.cover_view_left + 0.5 * self.diameter_main_top + bending),
+                   (
+                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top),
+                   self.diameter_main_top,
+                   self.diameter_main_top),
+                  ((
+                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top - bending),
+                   (
+                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top),
+                   self.diameter_main_top,
+                   self.diameter_main_top, bugle),
+                  ((
+                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top),
+                   (
+                           start_point_y + self.beam_height - self.cover_top - self.diameter_stirrup - 0.5 * self.diameter_main_top - bending),
+                   self.diameter_main_top, self.diameter_main_top),
+                  ((
+                           start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right - 0.5 * self.diameter_main_top),
+                   start_point_y + self.cover_bottom)]
+        return points
+
+    def bottom_bar_points(self, start_point_x: float, start_point_y: float) -> list[tuple]:
+        """Pret dolny w widoku, od punktu poczatkowego belki"""
+        points = [((start_point_x + self.cover_view_left),
+                   (start_point_y + self.cover_bottom + self.diameter_stirrup + 0.5 * self.diameter_main_bottom),
+                   self.diameter_main_bottom, self.diameter_main_bottom),
+                  (
+                      start_point_x + self.width_support_left + self.beam_span + self.width_support_right - self.cover_view_right,
+                      (start_point_y + self.cover_bottom + self.diameter_stirrup + 0.5 * self.diameter_main_bottom))]
+        return points
+
+    def stirrup_points(self, start_point_x: float, start_point_y: float, anchoring_stirrup: float = 80) -> list[tuple]:
+        """Strzemie w przekroju, od lewego dolnego naroza przekroju"""
+        bending_stirrup = self.bar_bending(self.diameter_stirrup)
+        bending_arrow = self.bar_bulge(bending_stirrup)
+
+        points = [
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup - anchoring_stirrup,
+             self.diameter_stirrup, self.diameter_stirrup),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
+             self.diameter_stirrup, self.diameter_stirrup, bending_arrow),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup),
+            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup - bending_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup, bending_arrow),
+            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
+             self.diameter_stirrup, self.diameter_stirrup),
+            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup,
+             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup + bending_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup, bending_arrow),
+            (start_point_x + self.beam_width - self.cover_right - 0.5 * self.diameter_stirrup - bending_stirrup,
+             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
+             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup, bending_arrow),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
+             start_point_y + self.cover_bottom + 0.5 * self.diameter_stirrup + bending_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup - bending_stirrup,
+             self.diameter_stirrup, self.diameter_stirrup, bending_arrow),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup),
+            (start_point_x + self.cover_left + 0.5 * self.diameter_stirrup + bending_stirrup + anchoring_stirrup,
+             start_point_y + self.beam_height - self.cover_top - 0.5 * self.diameter_stirrup, self.diameter_stirrup,
+             self.diameter_stirrup)
+        ]
+        return points
+
+    def bar_layout(self, localization: str) -> BarLayout:
+        """Uklad pretow w przekroju ('top'/'bottom'), liczony raz na element (solve_bar_layout jest tez pamietany)"""
+        if localization not in self.bar_layouts:
+            bar = self.bill_top if localization == 'top' else self.bill_bottom
+            self.bar_layouts[localization] = solve_bar_layout(
+                self.beam_width, self.beam_height, self.cover_left, self.cover_right,
+                self.cover_top if localization == 'top' else self.cover_bottom,
+                self.diameter_stirrup, self.bar_bending(self.diameter_stirrup), bar['diameter'], bar['quantity_bar'])
+        return self.bar_layouts[localization]
+
+    @property
+    def bars_fit(self) -> bool:
+        """
+        Prety gorne i dolne mieszcza sie w przekroju razem: glebokosc warstw gornych i dolnych (od krawedzi,
+        z otulina i strzemieniem) nie wieksza niz wysokosc belki - inaczej prety gorne nachodza na dolne
+        """
+        top, bottom = self.bar_layout('top'), self.bar_layout('bottom')
+        depth_top = top.rows[-1].depth + self.bill_top['diameter'] / 2
+        depth_bottom = bottom.rows[-1].depth + self.bill_bottom['diameter'] / 2
+        return top.fits and bottom.fits and depth_top + depth_bottom <= self.beam_height
+
+    def schedule(self) -> BendingSchedule:
+        return self.steel_bill.schedule(self.number_of_elements, self.mass_1m_bar)
+
+    def quantities(self) -> dict:
+        """Ilosci stali i strzemion jako zwykle dane (JSON)"""
+        schedule = self.schedule()
+        layout = self.stirrup_layout
+        return {
+            'name': self.name,
+            'number_of_elements': self.number_of_elements,
+            'stirrups': {
+                'count': self.count_stirrups,
+                'spacing': layout.spacing,
+                'end_distance': layout.end_distance,
+                'zones': [{'name': zone.name, 'start': zone.start, 'spacing': zone.spacing, 'count': zone.count}
+                          for zone in layout.zones],
+            },
+            'bars': [{
+                'number': bar['number'],
+                'steel_grade': bar['steel_grade'],
+                'diameter': bar['diameter'],
+                'quantity': bar['quantity_bar'],
+                'length': bar['length'],
+                'total_quantity': bar['quantity_bar'] * self.number_of_elements,
+            } for bar in self.steel_bill],
+            'section': {localization: [row.count for row in self.bar_layout(localization).rows]
+                        for localization in ('top', 'bottom')},
+            'warnings': [] if self.bars_fit else [self.BAR_LAYOUT_WARNING],
+            'schedule': [{
+                'steel_grade': steel_grade,
+                'diameter': diameter,
+                'total_length': total_length,
+                'mass_1m': mass_1m,
+                'mass': mass,
+            } for (steel_grade, diameter), total_length, mass_1m, mass in zip(
+                schedule.columns, schedule.total_length, schedule.mass_1m, schedule.mass)],
+            'mass_total': schedule.mass_total,
+        }
@@ -0,0 +1,66 @@
+from typing import Mapping
+
+from calc.app.mainclass import DXF_FORMATS
+
+# pola formularza belki w kolejnosci z calc.views.download_dxf_beam: (nazwa, typ)
+BEAM_FIELDS = (
+    ('name', str),
+    ('beam_span', float),
+    ('beam_height', float),
+    ('beam_width', float),
+    ('width_support_left', int),
+    ('width_support_right', int),
+    ('diameter_main_top', int),
+    ('quantity_main_top', int),
+    ('steel_grade_main_top', str),
+    ('diameter_main_bottom', int),
+    ('quantity_main_bottom', int),
+    ('steel_grade_main_bottom', str),
+    ('diameter_stirrup', int),
+    ('steel_grade_stirrup', str),
+    ('cover_top', int),
+    ('cover_bottom', int),
+    ('cover_view_left', int),
+    ('cover_view_right', int),
+    ('cover_left', int),
+    ('cover_right', int),
+    ('first_row_stirrup_range_left', int),
+    ('first_row_stirrup_range_right', int),
+    ('first_row_stirrup_spacing_left', int),
+    ('first_row_stirrup_spacing_right', int),
+    ('secondary_stirrup_spacing', int),
+    ('number_of_elements', int),
+    ('language', str),
+)
+
+# pola opcjonalne: (nazwa, typ, wartosc domyslna)
+BEAM_OPTIONAL_FIELDS = (
+    ('dxfversion', str, 'R2018'),
+    ('format', str, 'ascii'),
+)
+
+# wersje DXF, w ktorych powstaje rysunek (LWPOLYLINE wymaga co najmniej R2000)
+DXF_VERSIONS = ('R2000', 'R2004', 'R2007', 'R2010', 'R2013', 'R2018')
+
+# pola potrzebne tylko do rysunku, BeamModel ich nie przyjmuje
+DRAWING_FIELDS = ('language', 'dxfversion', 'format')
+
+
+def parse_beam_params(data: Mapping) -> dict:
+    """Zamiana danych z formularza (request.POST, wiersz CSV/JSON) na argumenty DxfElement"""
+    params = {}
+    for field, kind in BEAM_FIELDS:
+        params[field] = kind(data[field])
+    for field, kind, default in BEAM_OPTIONAL_FIELDS:
+        value = data.get(field)
+        params[field] = default if value in (None, '') else kind(value)
+    if params['dxfversion'] not in DXF_VERSIONS:
+        raise ValueError(f"dxfversion {params['dxfversion']} is not one of {', '.join(DXF_VERSIONS)}")
+    if params['format'] not in DXF_FORMATS:
+        raise ValueError(f"format {params['format']} is not one of {', '.join(DXF_FORMATS)}")
+    return params
+
+
+def parse_model_params(data: Mapping) -> dict:
+    """Argumenty BeamModel - bez pol dotyczacych tylko rysunku (jezyk, wersja DXF)"""
+    return {field: kind(data[field]) for field, kind in BEAM_FIELDS if field not in DRAWING_FIELDS}
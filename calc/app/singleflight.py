@@ -0,0 +1,182 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - bez blokad miedzy procesami, laczenie zadan tylko w obrebie procesu
+    fcntl = None
+
+
+class FileLock:
+    """
+    Blokada flock na pliku, wspolna dla procesow na tym samym hoscie. Plik jest usuwany przy zwolnieniu,
+    wiec po zdobyciu blokady sprawdzane jest, czy to wciaz ten sam plik (inaczej dwoch wlascicieli).
+    Bez fcntl albo bez dostepu do katalogu blokada jest zawsze wolna.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        try:
+            current = os.stat(self.path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            current = False
+        if not current:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class SingleFlight:
+    """
+    Laczenie jednoczesnych zadan o tym samym kluczu: pierwsze wykonuje fn, kolejne czekaja na jego wynik
+    (albo blad). Miedzy procesami - blokada pliku w lock_dir: proces, ktory czekal na blokade, wykonuje fn
+    po jej zwolnieniu, wiec fn powinna najpierw sprawdzic cache. Po lock_timeout [s] czekania fn jest
+    wykonywana bez blokady (zawieszony proces nie blokuje innych). lock_dir=None - tylko w obrebie procesu.
+    """
+
+    def __init__(self, lock_dir: str = None, lock_timeout: float = 30, poll_interval: float = 0.05):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.shared = 0
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+        self._flights: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if lock_dir is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """(wspolny wynik, True - to zadanie wykonuje fn)"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._flights[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            del self._flights[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # przerwane zadanie (np. rozlaczony klient widoku async) - czekajace dostaja zwykly blad
+            future.set_exception(RuntimeError("shared generation was interrupted"))
+
+    def _file_lock(self, key: str) -> FileLock or None:
+        return None if self.lock_dir is None else FileLock(os.path.join(self.lock_dir, key + '.lock'))
+
+    def _wait_started(self) -> float:
+        """Poczatek czekania na blokade innego procesu, zwraca termin czekania"""
+        with self._lock:
+            self.lock_waits += 1
+        return time.monotonic() + self.lock_timeout
+
+    def _timed_out(self, deadline: float) -> bool:
+        if time.monotonic() < deadline:
+            return False
+        with self._lock:
+            self.lock_timeouts += 1
+        return True
+
+    @contextmanager
+    def _locked(self, key: str):
+        lock = self._file_lock(key)
+        if lock is not None and not lock.try_acquire():
+            deadline = self._wait_started()
+            while not lock.try_acquire() and not self._timed_out(deadline):
+                time.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            if lock is not None:
+                lock.release()
+
+    @asynccontextmanager
+    async def _locked_async(self, key: str):
+        lock = self._file_lock(key)
+        if lock is not None and not lock.try_acquire():
+            deadline = self._wait_started()
+            while not lock.try_acquire() and not self._timed_out(deadline):
+                await asyncio.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def do(self, key: str, fn: Callable[[], object]) -> tuple[object, bool]:
+        """(wynik fn, True - wynik innego zadania)"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+        try:
+            with self._locked(key):
+                result = fn()
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable]) -> tuple[object, bool]:
+        """Jak do, dla widokow async: czekanie bez zajmowania watku, fn zwraca korutyne"""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            async with self._locked_async(key):
+                result = await fn()
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'shared': self.shared,
+                'lock_waits': self.lock_waits,
+                'lock_timeouts': self.lock_timeouts,
+            }
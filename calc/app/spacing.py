@@ -0,0 +1,123 @@
+import math
+from dataclasses import dataclass
+
+# krok rozstawu strzemion [mm]
+SPACING_STEP = 5
+# maksymalna suma odleglosci pierwszych strzemion od podpor [mm]
+MAX_LEFTOVER = 60
+
+
+@dataclass(frozen=True)
+class StirrupZone:
+    """Strefa strzemion o stalym rozstawie; direction=-1 - strefa liczona od prawej podpory"""
+    name: str
+    start: float
+    spacing: float
+    count: int
+    direction: int = 1
+
+    @property
+    def positions(self) -> list[float]:
+        return [self.start + self.direction * i * self.spacing for i in range(self.count)]
+
+    @property
+    def end(self) -> float:
+        return self.start + self.direction * (self.count - 1) * self.spacing
+
+
+@dataclass(frozen=True)
+class StirrupSpacing:
+    """Wynik doboru rozstawu: rozstaw drugiego rzedu, strefy i odleglosci pierwszych strzemion od podpor"""
+    beam_span: float
+    spacing: float
+    leftover: float
+    zones: tuple[StirrupZone, ...]
+    last_left: float
+    last_right: float
+
+    @property
+    def end_distance(self) -> float:
+        """Odleglosc pierwszego strzemienia od krawedzi podpory (po obu stronach taka sama)"""
+        return self.leftover / 2
+
+    @property
+    def positions(self) -> list[float]:
+        """Polozenia strzemion od lewej podpory, posortowane, bez powtorzen"""
+        positions = []
+        for zone in self.zones:
+            positions.extend(zone.positions)
+        return sorted(dict.fromkeys(positions))
+
+    @property
+    def second_row_count(self) -> int:
+        return math.ceil((self.last_right - self.last_left) / self.spacing)
+
+
+def first_row_length(range_value: float, spacing: float) -> float:
+    """Dlugosc strefy pierwszego rzedu zaokraglona w gore do pelnego rozstawu, 0 gdy strefy nie ma"""
+    if range_value != 0 and spacing != 0:
+        return math.ceil(range_value / spacing) * spacing
+    return 0
+
+
+def remainder(rest: float, spacing: float) -> float:
+    return rest - math.floor(rest / spacing) * spacing
+
+
+def admissible_spacing(rest: float, max_spacing: int, max_leftover: float = MAX_LEFTOVER,
+                       step: int = SPACING_STEP) -> int:
+    """
+    Najwiekszy rozstaw z siatki co step, nie wiekszy od max_spacing, dla ktorego rest % rozstaw <= max_leftover.
+    Dla m = floor(rest / s) warunek to s w przedziale [(rest - max_leftover) / m, rest / m] - sprawdzane sa kolejne m
+    od najmniejszego mozliwego; dla m * step <= max_leftover przedzial zawsze zawiera wielokrotnosc step,
+    wiec petla konczy sie po kilku krokach.
+    """
+    if max_spacing < step:
+        raise ValueError(f"secondary stirrup spacing {max_spacing} is less than {step}[mm]")
+    if rest < 0:
+        raise ValueError(f"first row stirrup ranges exceed beam span by {-rest}[mm]")
+    if remainder(rest, max_spacing) <= max_leftover:
+        return max_spacing
+
+    m = max(1, math.floor(rest / max_spacing))
+    while True:
+        spacing = math.floor(min(max_spacing, rest / m) / step) * step
+        if spacing < step:
+            raise ValueError(f"no stirrup spacing for {rest}[mm]")
+        if remainder(rest, spacing) <= max_leftover:
+            return spacing
+        m += 1
+
+
+def solve_stirrup_spacing(beam_span: float, secondary_spacing: int,
+                          range_left: float = 0, spacing_left: float = 0,
+                          range_right: float = 0, spacing_right: float = 0,
+                          max_leftover: float = MAX_LEFTOVER) -> StirrupSpacing:
+    """
+    Rozstaw strzemion w belce: strefy pierwszego rzedu przy podporach (zaokraglone do pelnego rozstawu)
+    i drugi rzad w srodku. Rozstaw drugiego rzedu jest zmniejszany (co 5 mm) tak, zeby reszta do rozdzielenia
+    na oba konce belki nie przekraczala max_leftover.
+    """
+    first_rows = first_row_length(range_left, spacing_left) + first_row_length(range_right, spacing_right)
+    rest = beam_span - first_rows
+    spacing = admissible_spacing(rest, secondary_spacing, max_leftover)
+    leftover = beam_span - (first_rows + math.floor(rest / spacing) * spacing)
+
+    zones = []
+    last_left = 0
+    last_right = beam_span
+    if range_left != 0 and spacing_left != 0:
+        zone = StirrupZone('left', leftover / 2, spacing_left, int(math.ceil(range_left / spacing_left) + 1))
+        zones.append(zone)
+        last_left = zone.end
+    if range_right != 0 and spacing_right != 0:
+        zone = StirrupZone('right', beam_span - leftover / 2, spacing_right,
+                           int(math.ceil(range_right / spacing_right) + 1), direction=-1)
+        zones.append(zone)
+        last_right = zone.end
+
+    count = int((beam_span - last_left - ((beam_span - last_right) if last_right > 0 else 0)) / spacing) + 1
+    zones.append(StirrupZone('middle', last_left if last_left > 0 else leftover / 2, spacing, count))
+
+    return StirrupSpacing(beam_span=beam_span, spacing=spacing, leftover=leftover, zones=tuple(zones),
+                          last_left=last_left, last_right=last_right)
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+
+@dataclass(frozen=True)
+class BendingSchedule:
+    """
+    Zestawienie stali do wykazu zbrojenia, kolumny (gatunek, srednica) w kolejnosci wystapienia.
+    rows - dlugosc pretow pozycji [m] w jej kolumnie, '-' w pozostalych
+    """
+    grades: dict[str, list[float]]
+    columns: tuple[tuple[str, float], ...]
+    rows: tuple[tuple[float or str, ...], ...]
+    total_length: tuple[float, ...]
+    mass_1m: tuple[float, ...]
+    mass: tuple[float, ...]
+    mass_total: float
+
+
+class SteelBill:
+    """
+    Wykaz stali elementu. Pozycje numerowane od 1 w kolejnosci dodawania (numer sie nie zmienia),
+    indeks po (gatunek stali, srednica) dla kolumn wykazu zbrojenia.
+    """
+
+    def __init__(self):
+        self._bars: list[dict] = []
+        self._index: dict[tuple[str, float], list[dict]] = {}
+
+    def add(self, name_element: str, diameter: float, quantity_bar: int, length: float, steel_grade: str,
+            points_generate: tuple = None) -> dict:
+        bar = {
+            'name_element': name_element,
+            'number': len(self._bars) + 1,
+            'diameter': diameter,
+            'quantity_bar': quantity_bar,
+            'length': length,
+            'steel_grade': steel_grade,
+            'points_generate': points_generate,
+        }
+        self._bars.append(bar)
+        self._index.setdefault((steel_grade, diameter), []).append(bar)
+        return bar
+
+    def __len__(self) -> int:
+        return len(self._bars)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._bars)
+
+    def __getitem__(self, index: int) -> dict:
+        return self._bars[index]
+
+    def grades(self) -> dict[str, list[float]]:
+        """Gatunki stali i ich srednice w kolejnosci pierwszego wystapienia (kolumny wykazu)"""
+        grades = {}
+        for steel_grade, diameter in self._index:
+            grades.setdefault(steel_grade, []).append(diameter)
+        return grades
+
+    def elements(self) -> list[str]:
+        return sorted({bar['name_element'] for bar in self._bars})
+
+    def schedule(self, number_of_elements: int, mass_1m: Callable[[float], float]) -> BendingSchedule:
+        """Zestawienie w jednym przejsciu po pozycjach: dlugosci w kolumnach, sumy, masy (mass_1m - kg/m)"""
+        grades = self.grades()
+        columns = tuple((steel_grade, diameter) for steel_grade, diameters in grades.items() for diameter in diameters)
+        column_index = {column: index for index, column in enumerate(columns)}
+        rows = []
+        total_length = [0] * len(columns)
+        for bar in self._bars:
+            index = column_index[(bar['steel_grade'], bar['diameter'])]
+            value = round(bar['length'] / 1000 * bar['quantity_bar'] * number_of_elements, 2)
+            row = ['-'] * len(columns)
+            row[index] = value
+            rows.append(tuple(row))
+            total_length[index] += value
+
+        unit_mass = [mass_1m(diameter) for _, diameter in columns]
+        mass = [round(length * unit, 1) for length, unit in zip(total_length, unit_mass)]
+        mass_total = 0
+        for value in mass:
+            mass_total += value
+        return BendingSchedule(grades=grades, columns=columns, rows=tuple(rows),
+                               total_length=tuple(total_length), mass_1m=tuple(unit_mass), mass=tuple(mass),
+                               mass_total=mass_total)
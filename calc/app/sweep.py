@@ -0,0 +1,260 @@
+import math
+from typing import Mapping
+
+import numpy as np
+
+from calc.app.model import BeamModel
+from calc.app.params import BEAM_FIELDS, DRAWING_FIELDS
+from calc.app.spacing import MAX_LEFTOVER, SPACING_STEP, solve_stirrup_spacing
+
+# pola liczbowe BeamModel, ktore mozna zmieniac w przegladzie (gatunki stali i nazwa - stale z bazy)
+SWEEP_FIELDS = tuple(field for field, kind in BEAM_FIELDS if kind is not str and field not in DRAWING_FIELDS)
+
+# kolumny wyniku, po ktorych mozna sortowac
+SWEEP_RESULTS = ('mass_total', 'count_stirrups', 'stirrup_spacing', 'end_distance',
+                 'length_top', 'length_bottom', 'length_stirrup')
+
+
+class SweepError(ValueError):
+    pass
+
+
+def sweep_values(value) -> np.ndarray:
+    """Wartosci parametru: liczba, lista albo {"start", "stop", "step"} (stop wlacznie)"""
+    if isinstance(value, Mapping):
+        start, stop, step = float(value['start']), float(value['stop']), float(value.get('step', 1))
+        if step <= 0:
+            raise SweepError(f"step {step} must be greater than 0")
+        return np.arange(start, stop + step / 2, step)
+    if isinstance(value, (list, tuple)):
+        return np.array([float(item) for item in value])
+    return np.array([float(value)])
+
+
+def bar_bending(diameter: np.ndarray) -> np.ndarray:
+    """BeamModel.bar_bending dla tablic"""
+    return np.where(diameter <= 16, diameter * 2.5, diameter * 4.0)
+
+
+def length_polyline(points: list[tuple], arc_radius: np.ndarray, angle: int = 90) -> np.ndarray:
+    """
+    BeamModel.length_bar dla tablic: points - (x, y, luk), luk=True - odcinek do nastepnego punktu jest lukiem.
+    Sumowanie w tej samej kolejnosci co w modelu, wiec zaokraglenie daje te same dlugosci.
+    """
+    total = np.zeros(np.broadcast(*(point[0] for point in points), arc_radius).shape)
+    for (x, y, arc), (next_x, next_y, _) in zip(points, points[1:]):
+        if arc:
+            total = total + 2 * (angle / 360) * math.pi * arc_radius
+        else:
+            total = total + ((x - next_x) ** 2 + (y - next_y) ** 2) ** 0.5
+    return np.round(total)
+
+
+def round_half(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    Zaokraglenie jak round() w wykazie: np.round mnozy przez 10**digits i daje inny wynik dla liczb blisko polowki,
+    te punkty (nieliczne) sa zaokraglane przez round().
+    """
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    rounded[near] = [round(float(value), digits) for value in values[near]]
+    return rounded
+
+
+def first_row_length(range_value: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    zone = (range_value != 0) & (spacing != 0)
+    return np.where(zone, np.ceil(range_value / np.where(zone, spacing, 1)) * spacing, 0)
+
+
+def remainder(rest: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    return rest - np.floor(rest / spacing) * spacing
+
+
+def admissible_spacing(rest: np.ndarray, max_spacing: np.ndarray, max_leftover: float = MAX_LEFTOVER,
+                       step: int = SPACING_STEP) -> tuple[np.ndarray, np.ndarray]:
+    """calc.app.spacing.admissible_spacing dla tablic: (rozstaw, poprawny) - bez wyjatkow, bledne punkty odrzucane"""
+    valid = (max_spacing >= step) & (rest >= 0)
+    safe = np.where(valid, max_spacing, step)
+    spacing = safe.astype(float)
+    pending = np.flatnonzero(valid & (remainder(rest, safe) > max_leftover))
+
+    m = np.maximum(1, np.floor(rest[pending] / safe[pending]))
+    while pending.size:
+        candidate = np.floor(np.minimum(safe[pending], rest[pending] / m) / step) * step
+        failed = candidate < step
+        valid[pending[failed]] = False
+        found = ~failed & (remainder(rest[pending], np.where(failed, step, candidate)) <= max_leftover)
+        spacing[pending[found]] = candidate[found]
+        keep = ~failed & ~found
+        pending, m = pending[keep], m[keep] + 1
+    return spacing, valid
+
+
+def stirrup_counts(beam_span: np.ndarray, secondary_spacing: np.ndarray, range_left: np.ndarray,
+                   spacing_left: np.ndarray, range_right: np.ndarray, spacing_right: np.ndarray) -> dict:
+    """
+    solve_stirrup_spacing dla tablic: rozstaw drugiego rzedu, odleglosc od podpor i liczba strzemion (bez powtorzen).
+    Punkty, w ktorych drugi rzad wchodzi na strefe przy prawej podporze, liczone sa solve_stirrup_spacing.
+    """
+    first_rows = first_row_length(range_left, spacing_left) + first_row_length(range_right, spacing_right)
+    rest = beam_span - first_rows
+    spacing, valid = admissible_spacing(rest, secondary_spacing)
+    leftover = beam_span - (first_rows + np.floor(rest / spacing) * spacing)
+
+    has_left = (range_left != 0) & (spacing_left != 0)
+    has_right = (range_right != 0) & (spacing_right != 0)
+    gaps_left = np.ceil(range_left / np.where(has_left, spacing_left, 1))
+    gaps_right = np.ceil(range_right / np.where(has_right, spacing_right, 1))
+    last_left = np.where(has_left, leftover / 2 + gaps_left * spacing_left, 0)
+    last_right = np.where(has_right, (beam_span - leftover / 2) - gaps_right * spacing_right, beam_span)
+
+    count_middle = np.trunc(
+        (beam_span - last_left - np.where(last_right > 0, beam_span - last_right, 0)) / spacing) + 1
+    start_middle = np.where(last_left > 0, last_left, leftover / 2)
+    end_middle = start_middle + (count_middle - 1) * spacing
+
+    count = (count_middle + np.where(has_left, gaps_left + 1, 0) + np.where(has_right, gaps_right + 1, 0)
+             - (has_left & (last_left > 0)) - (has_right & (end_middle == last_right)))
+
+    irregular = np.flatnonzero(valid & ((has_right & (end_middle > last_right))
+                                        | (has_left & has_right & (last_left >= last_right)) | (count_middle < 1)))
+    for index in irregular:
+        layout = solve_stirrup_spacing(beam_span[index], spacing[index], range_left[index], spacing_left[index],
+                                       range_right[index], spacing_right[index])
+        count[index] = len(layout.positions)
+    return {'stirrup_spacing': spacing, 'end_distance': leftover / 2, 'count_stirrups': count, 'valid': valid}
+
+
+def column_mass(lengths: list[np.ndarray], diameters: list[np.ndarray], same: list[list[np.ndarray]],
+                mass_1m: dict) -> np.ndarray:
+    """
+    Suma mas kolumn wykazu: pozycje o tym samym (gatunek, srednica) w jednej kolumnie jak w SteelBill.schedule.
+    same[i][j] - pozycja j (j < i) w kolumnie pozycji i; kolumna liczona przy pierwszej swojej pozycji.
+    """
+    total = np.zeros(lengths[0].shape)
+    for i, (length, diameter) in enumerate(zip(lengths, diameters)):
+        owner = np.ones(length.shape, dtype=bool)
+        for j in range(i):
+            owner &= ~same[i][j]
+        column_length = length.copy()
+        for k in range(i + 1, len(lengths)):
+            column_length = column_length + np.where(same[k][i] & owner, lengths[k], 0)
+        unit = np.vectorize(mass_1m.__getitem__, otypes=[float])(diameter)
+        total = total + np.where(owner, round_half(column_length * unit, 1), 0)
+    return total
+
+
+def beam_sweep(base: Mapping, ranges: Mapping, sort: str = 'mass_total', limit: int = 100,
+               max_points: int = 200000) -> dict:
+    """
+    Przeglad kombinacji parametrow belki bez budowania rysunku i bez BeamModel w petli: dlugosci pretow,
+    rozstaw i liczba strzemion, masa stali liczone na tablicach NumPy dla calej siatki (iloczyn kartezjanski ranges).
+    base - pozostale parametry belki jak w formularzu; wynik - `limit` najlepszych punktow wg `sort` (rosnaco).
+    """
+    unknown = [field for field in ranges if field not in SWEEP_FIELDS]
+    if unknown:
+        raise SweepError(f"fields {', '.join(unknown)} can not be swept")
+    if sort not in SWEEP_RESULTS:
+        raise SweepError(f"sort must be one of {', '.join(SWEEP_RESULTS)}")
+
+    params, swept = {}, []
+    for field, kind in BEAM_FIELDS:
+        if field in DRAWING_FIELDS:
+            continue
+        if kind is str:
+            params[field] = BeamModel._is_valid_path_name(str(base[field]))
+            continue
+        values = sweep_values(ranges[field]) if field in ranges else np.array([float(kind(base[field]))])
+        low, high = BeamModel.LIMITS[field]
+        outside = values[(values < low) | (values > high)]
+        if outside.size or not values.size:
+            raise SweepError(f"{field}: {outside[0] if outside.size else 'no values'} is outside {low}-{high}")
+        if field in ranges:
+            swept.append((field, values))
+        params[field] = values
+    size = math.prod(values.size for _, values in swept)
+    if size > max_points:
+        raise SweepError(f"{size} points, max is {max_points}")
+
+    for (field, _), values in zip(swept, np.meshgrid(*(values for _, values in swept), indexing='ij')):
+        params[field] = values.ravel()
+    shape = (size,)
+    p = {field: np.broadcast_to(value, shape) if isinstance(value, np.ndarray) else value
+         for field, value in params.items()}
+
+    valid = ((p['beam_span'] > BeamModel.LIMITS['beam_span'][0])
+             & (p['beam_span'] - p['first_row_stirrup_range_left'] - p['first_row_stirrup_range_right'] >= 0))
+
+    secondary = np.floor(np.minimum(0.75 * p['beam_height'] * 0.9, p['secondary_stirrup_spacing']) / 5) * 5
+    secondary = np.floor(np.minimum(np.minimum(secondary, 400), np.trunc(p['beam_height'] * 0.75)) / 5) * 5
+    stirrups = stirrup_counts(p['beam_span'], secondary,
+                              p['first_row_stirrup_range_left'], p['first_row_stirrup_spacing_left'],
+                              p['first_row_stirrup_range_right'], p['first_row_stirrup_spacing_right'])
+    valid &= stirrups.pop('valid')
+
+    # wierzcholki jak w BeamModel.top_bar_points / bottom_bar_points / stirrup_points (punkt poczatkowy 0, 0)
+    d, ds = p['diameter_main_top'], p['diameter_stirrup']
+    bending = bar_bending(d)
+    length = p['width_support_left'] + p['beam_span'] + p['width_support_right']
+    top_y = p['beam_height'] - p['cover_top'] - ds - 0.5 * d
+    left_x = p['cover_view_left'] + 0.5 * d
+    right_x = length - p['cover_view_right'] - 0.5 * d
+    length_top = length_polyline([
+        (left_x, p['cover_bottom'], False), (left_x, top_y - bending, True), (left_x + bending, top_y, False),
+        (right_x - bending, top_y, True), (right_x, top_y - bending, False), (right_x, p['cover_bottom'], False)],
+        bending)
+
+    bottom_y = p['cover_bottom'] + ds + 0.5 * p['diameter_main_bottom']
+    length_bottom = length_polyline([
+        (p['cover_view_left'], bottom_y, False), (length - p['cover_view_right'], bottom_y, False)],
+        bar_bending(p['diameter_main_bottom']))
+
+    bending_stirrup, anchoring = bar_bending(ds), 80
+    x0, x1 = p['cover_left'] + 0.5 * ds, p['beam_width'] - p['cover_right'] - 0.5 * ds
+    y0, y1 = p['cover_bottom'] + 0.5 * ds, p['beam_height'] - p['cover_top'] - 0.5 * ds
+    length_stirrup = length_polyline([
+        (x0, y1 - bending_stirrup - anchoring, False), (x0, y1 - bending_stirrup, True),
+        (x0 + bending_stirrup, y1, False), (x1 - bending_stirrup, y1, True), (x1, y1 - bending_stirrup, False),
+        (x1, y0 + bending_stirrup, True), (x1 - bending_stirrup, y0, False), (x0 + bending_stirrup, y0, True),
+        (x0, y0 + bending_stirrup, False), (x0, y1 - bending_stirrup, True), (x0 + bending_stirrup, y1, False),
+        (x0 + bending_stirrup + anchoring, y1, False)],
+        bending_stirrup)
+
+    # wykaz: dlugosc pozycji [m] w kolumnie jak w SteelBill.schedule, masa kolumny z mass_1m_bar
+    n = p['number_of_elements']
+    positions = [
+        (p['steel_grade_main_top'], d, round_half(length_top / 1000 * p['quantity_main_top'] * n, 2)),
+        (p['steel_grade_main_bottom'], p['diameter_main_bottom'],
+         round_half(length_bottom / 1000 * p['quantity_main_bottom'] * n, 2)),
+        (p['steel_grade_stirrup'], ds, round_half(length_stirrup / 1000 * stirrups['count_stirrups'] * n, 2)),
+    ]
+    same = [[(grade == grade_j) & (diameter == diameter_j) for grade_j, diameter_j, _ in positions[:i]]
+            for i, (grade, diameter, _) in enumerate(positions)]
+    mass_1m = {diameter: BeamModel.mass_1m_bar(float(diameter))
+               for diameter in np.unique(np.concatenate([d, p['diameter_main_bottom'], ds]))}
+    mass_total = column_mass([length for _, _, length in positions], [diameter for _, diameter, _ in positions],
+                             same, mass_1m)
+
+    results = dict(stirrups, length_top=length_top, length_bottom=length_bottom, length_stirrup=length_stirrup,
+                   mass_total=mass_total)
+    index = np.flatnonzero(valid)
+    order = index[np.lexsort((index, results['mass_total'][index], results[sort][index]))][:limit]
+
+    kinds = dict(BEAM_FIELDS)
+    table = []
+    for rank, point in enumerate(order, start=1):
+        row = {'rank': rank}
+        row.update({field: kinds[field](p[field][point]) for field, _ in swept})
+        row.update({
+            'mass_total': round(float(mass_total[point]), 1),
+            'count_stirrups': int(stirrups['count_stirrups'][point]),
+            'stirrup_spacing': int(stirrups['stirrup_spacing'][point]),
+            'end_distance': float(stirrups['end_distance'][point]),
+            'length_top': int(length_top[point]),
+            'length_bottom': int(length_bottom[point]),
+            'length_stirrup': int(length_stirrup[point]),
+        })
+        table.append(row)
+    return {'points': size, 'valid': int(index.size), 'sort': sort, 'fields': [field for field, _ in swept],
+            'table': table}
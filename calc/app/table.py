@@ -0,0 +1,42 @@
+from typing import Iterator
+
+
+class TableGrid:
+    """
+    Krawedzie komorek tabeli zbierane przed rysowaniem. Wspolne i stykajace sie krawedzie na tej samej prostej
+    sa laczone, tabela to kilka dlugich linii zamiast prostokata dla kazdej komorki.
+    """
+
+    def __init__(self, precision: int = 6):
+        self.precision = precision
+        self.horizontal: dict[float, list[tuple[float, float]]] = {}
+        self.vertical: dict[float, list[tuple[float, float]]] = {}
+
+    def add_rectangle(self, x0: float, y0: float, x1: float, y1: float):
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        for y in (y0, y1):
+            self.horizontal.setdefault(round(y, self.precision), []).append((x0, x1))
+        for x in (x0, x1):
+            self.vertical.setdefault(round(x, self.precision), []).append((y0, y1))
+
+    def _merge(self, intervals: list[tuple[float, float]]) -> Iterator[tuple[float, float]]:
+        tolerance = 10 ** -self.precision
+        start, end = None, None
+        for low, high in sorted(intervals):
+            if start is not None and low <= end + tolerance:
+                end = max(end, high)
+                continue
+            if start is not None:
+                yield start, end
+            start, end = low, high
+        if start is not None:
+            yield start, end
+
+    def lines(self) -> Iterator[tuple[tuple[float, float], tuple[float, float]]]:
+        for y, intervals in sorted(self.horizontal.items()):
+            for x0, x1 in self._merge(intervals):
+                yield (x0, y), (x1, y)
+        for x, intervals in sorted(self.vertical.items()):
+            for y0, y1 in self._merge(intervals):
+                yield (x, y0), (x, y1)
@@ -0,0 +1,79 @@
+import threading
+
+import ezdxf
+from ezdxf.document import Drawing
+from ezdxf.tools.standards import linetypes as standard_linetypes
+
+# zmienne naglowka ustawiane przez DxfElement.initial_drawing
+HEADER_VARS = ('$LTSCALE', '$INSUNITS', '$MEASUREMENT')
+TABLES = ('layers', 'styles', 'dimstyles')
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def _table_entry_attribs(entry) -> dict:
+    """Atrybuty wpisu tablicy bez uchwytow, ktore sa wazne tylko w dokumencie szablonu"""
+    return {key: value for key, value in entry.dxfattribs(drop={'handle', 'owner', 'name'}).items()
+            if not key.endswith('_handle')}
+
+
+class DrawingTemplate:
+    """
+    Zasoby wspolne dla kazdego rysunku belki: zmienne naglowka, typy linii, warstwy, style tekstu,
+    style wymiarowania i bloki. Zbierane raz na proces z przygotowanego dokumentu zrodlowego,
+    kazdy rysunek (takze pierwszy) dostaje je na czysty dokument bez ponownego liczenia.
+    ezdxf nie potrafi tanio skopiowac calego dokumentu (deepcopy/pickle), dlatego kopiowane sa same zasoby.
+    """
+
+    def __init__(self, drawing: Drawing):
+        self.dxfversion = drawing.dxfversion
+        bare = ezdxf.new(dxfversion=self.dxfversion)
+
+        self.header = {var: drawing.header[var] for var in HEADER_VARS}
+        self.tables = {}
+        for table_name in TABLES:
+            existing = {entry.dxf.name.lower() for entry in getattr(bare, table_name)}
+            self.tables[table_name] = [(entry.dxf.name, _table_entry_attribs(entry))
+                                       for entry in getattr(drawing, table_name)
+                                       if entry.dxf.name.lower() not in existing]
+
+        used_linetypes = {attribs['linetype'].upper() for _, attribs in self.tables['layers'] if 'linetype' in attribs}
+        self.linetypes = [(name, description, tuple(pattern))
+                          for name, description, pattern in standard_linetypes()
+                          if name.upper() in used_linetypes and name not in bare.linetypes]
+
+        existing_blocks = {block.name.lower() for block in bare.blocks}
+        self.blocks = [(block.name, [entity.copy() for entity in block])
+                       for block in drawing.blocks
+                       if block.name.lower() not in existing_blocks and not block.name.startswith('*')]
+
+    def new_document(self) -> Drawing:
+        drawing = ezdxf.new(dxfversion=self.dxfversion)
+        for var, value in self.header.items():
+            drawing.header[var] = value
+        # ezdxf zdejmuje klucze z przekazanych atrybutow ('pattern' typu linii), wiec kazdy dokument dostaje
+        # nowy slownik - inaczej od drugiego rysunku typy linii nie mialyby wzoru kreskowania
+        for name, description, pattern in self.linetypes:
+            drawing.linetypes.new(name, dxfattribs={'description': description, 'pattern': list(pattern)})
+        for table_name in TABLES:
+            table = getattr(drawing, table_name)
+            for name, attribs in self.tables[table_name]:
+                table.new(name, dxfattribs=dict(attribs))
+        for name, entities in self.blocks:
+            block = drawing.blocks.new(name)
+            for entity in entities:
+                block.add_entity(entity.copy())
+        return drawing
+
+
+def get_template(dxfversion: str) -> DrawingTemplate or None:
+    return _templates.get(dxfversion)
+
+
+def register_template(dxfversion: str, drawing: Drawing) -> DrawingTemplate:
+    """Zapamietanie zasobow przygotowanego rysunku jako szablonu dla wersji DXF"""
+    with _lock:
+        if dxfversion not in _templates:
+            _templates[dxfversion] = DrawingTemplate(drawing)
+        return _templates[dxfversion]
@@ -0,0 +1,81 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator
+
+_NULL_STAGE = nullcontext()
+
+
+class StageTimer:
+    """
+    Czasy etapow budowania rysunku [ms] i liczba nowych obiektow DXF w etapie.
+    enabled=False - stage() zwraca pusty kontekst, bez pomiaru (NULL_TIMER, domyslny w DxfElement).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: list[tuple[str, float, int]] = []
+
+    def stage(self, name: str, count: Callable[[], int] = None):
+        """count - liczba obiektow w rysunku, mierzona przed i po etapie"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name, count)
+
+    @contextmanager
+    def _measure(self, name: str, count: Callable[[], int] = None) -> Iterator[None]:
+        entities = count() if count is not None else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.stages.append((name, duration, count() - entities if count is not None else 0))
+
+
+NULL_TIMER = StageTimer(enabled=False)
+
+
+def server_timing(stages: list[tuple[str, float, int]]) -> str:
+    """Naglowek Server-Timing, np. 'create_table;dur=4.21;desc="312 entities"'"""
+    return ', '.join(f'{name};dur={duration:.2f};desc="{entities} entities"' for name, duration, entities in stages)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Percentyl metoda najblizszej pozycji, values posortowane rosnaco"""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class TimingStats:
+    """Ostatnie `window` pomiarow kazdego etapu, percentyle p50/p95/p99 dla endpointu statystyk"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._durations: dict[str, deque] = {}
+        self._entities: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stages: list[tuple[str, float, int]]):
+        with self._lock:
+            for name, duration, entities in stages:
+                if name not in self._durations:
+                    self._durations[name] = deque(maxlen=self.window)
+                    self._entities[name] = deque(maxlen=self.window)
+                self._durations[name].append(duration)
+                self._entities[name].append(entities)
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = {name: (sorted(durations), sorted(self._entities[name]))
+                       for name, durations in self._durations.items()}
+        return {
+            name: {
+                'count': len(durations),
+                'p50': round(percentile(durations, 50), 3),
+                'p95': round(percentile(durations, 95), 3),
+                'p99': round(percentile(durations, 99), 3),
+                'entities_p50': percentile(entities, 50),
+            } for name, (durations, entities) in samples.items()
+        }
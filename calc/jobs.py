@@ -0,0 +1,163 @@
+import glob
+import os
+import time
+import uuid
+from concurrent import futures
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from calc.app.batch import build_combined, build_files, iter_zip
+from calc.app.cache import DxfCache
+from calc.app.engine import GenerationService
+from calc.models import GenerationJob
+
+
+def submit_job(items: list[tuple[int, dict]], errors: list, output: str = 'zip') -> GenerationJob:
+    """Dodanie zadania do kolejki, parametry wierszy sa juz sprawdzone przez calc.app.batch.parse_rows"""
+    return GenerationJob.objects.create(
+        output=output,
+        items=[[row_number, params] for row_number, params in items],
+        errors=errors,
+        total=len(items),
+        max_attempts=settings.DXF_JOB_MAX_ATTEMPTS,
+        expires_at=timezone.now() + timedelta(seconds=settings.DXF_JOB_TTL),
+    )
+
+
+def claim_job() -> GenerationJob or None:
+    """
+    Pobranie najstarszego zadania z kolejki; update z warunkiem na status - jeden worker na zadanie.
+    Kazde pobranie dostaje nowy claim_token: worker uznany za porzucony nie nadpisze wyniku kolejnej proby.
+    """
+    for job_id in GenerationJob.objects.filter(status=GenerationJob.QUEUED).values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = GenerationJob.objects.filter(id=job_id, status=GenerationJob.QUEUED).update(
+            status=GenerationJob.RUNNING, attempts=F('attempts') + 1, started=now, heartbeat=now, progress=0,
+            claim_token=uuid.uuid4())
+        if claimed:
+            return GenerationJob.objects.get(id=job_id)
+    return None
+
+
+def artifact_path(job: GenerationJob) -> str:
+    return os.path.join(settings.DXF_JOB_DIR, f'{job.id}.{job.output}')
+
+
+def _wait_alive(service: GenerationService, future: futures.Future, timeout: float, heartbeat):
+    """service.result z biciem serca co DXF_JOB_STALE_AFTER / 3 s - dlugie zadanie nie jest uznane za porzucone"""
+    deadline = time.monotonic() + timeout
+    while not future.done() and time.monotonic() < deadline:
+        futures.wait([future], timeout=min(settings.DXF_JOB_STALE_AFTER / 3, deadline - time.monotonic()))
+        heartbeat()
+    return service.result(future, timeout=max(deadline - time.monotonic(), 0))
+
+
+def run_job(job: GenerationJob, cache: DxfCache, service: GenerationService):
+    """Budowanie pliku wynikowego zadania; blad - ponowienie az do max_attempts"""
+    items = [(row_number, params) for row_number, params in job.items]
+    errors = list(job.errors)
+    path = artifact_path(job)
+    os.makedirs(settings.DXF_JOB_DIR, exist_ok=True)
+    # zapisy tylko dopoki zadanie nalezy do tej proby
+    claimed = GenerationJob.objects.filter(id=job.id, claim_token=job.claim_token)
+
+    def heartbeat():
+        claimed.update(heartbeat=timezone.now())
+
+    def progress(done: int):
+        claimed.update(progress=done, heartbeat=timezone.now())
+
+    temp_path = f'{path}.{job.claim_token}.tmp'
+    try:
+        data = None
+        if job.output == 'dxf':
+            combined = service.submit(build_combined, items, deterministic=service.deterministic,
+                                      time_budget=service.time_budget)
+            data, build_errors = _wait_alive(service, combined, settings.DXF_TASK_TIMEOUT * max(len(items), 1),
+                                             heartbeat)
+            errors = sorted(errors + build_errors, key=lambda error: error['row'])
+            if not data:
+                # zadna belka nie dala sie narysowac - bez pustego pliku, ponowienie daloby to samo
+                claimed.update(
+                    status=GenerationJob.FAILED, errors=errors, last_error="no beam could be drawn",
+                    finished=timezone.now())
+                return
+        with open(temp_path, 'wb') as file:
+            if data is not None:
+                file.write(data)
+            else:
+                for chunk in iter_zip(build_files(items, errors, cache, service, progress)):
+                    file.write(chunk)
+        if not claimed.exists():
+            # zadanie uznane za porzucone i pobrane ponownie - wynik zapisze biezaca proba
+            os.remove(temp_path)
+            return
+        os.replace(temp_path, path)
+    except Exception as error:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        failed = job.attempts >= job.max_attempts
+        claimed.update(
+            status=GenerationJob.FAILED if failed else GenerationJob.QUEUED,
+            last_error=str(error) or type(error).__name__,
+            finished=timezone.now() if failed else None)
+        return
+
+    claimed.update(
+        status=GenerationJob.DONE, progress=job.total, errors=errors, artifact=path, finished=timezone.now())
+
+
+def cleanup_jobs() -> int:
+    """Wygasle zadania: usuniecie pliku wynikowego; zawieszone zadania (padniety worker) wracaja do kolejki"""
+    now = timezone.now()
+    stale_after = now - timedelta(seconds=settings.DXF_JOB_STALE_AFTER)
+    # bez bicia serca - zadania pobrane przed dodaniem pola heartbeat
+    stale = GenerationJob.objects.filter(Q(heartbeat__lt=stale_after) | Q(heartbeat=None, started__lt=stale_after),
+                                         status=GenerationJob.RUNNING)
+    stale.filter(attempts__lt=F('max_attempts')).update(status=GenerationJob.QUEUED)
+    stale.update(status=GenerationJob.FAILED, last_error="worker stopped responding", finished=now)
+
+    expired = 0
+    for job in GenerationJob.objects.filter(expires_at__lt=now).exclude(status=GenerationJob.EXPIRED):
+        for path in (job.artifact, artifact_path(job), *glob.glob(f'{glob.escape(artifact_path(job))}.*.tmp')):
+            if path and os.path.exists(path):
+                os.remove(path)
+        GenerationJob.objects.filter(id=job.id).update(status=GenerationJob.EXPIRED, artifact='', items=[])
+        expired += 1
+    return expired
+
+
+def job_status(job: GenerationJob) -> dict:
+    return {
+        'id': str(job.id),
+        'status': job.status,
+        'output': job.output,
+        'progress': job.progress,
+        'total': job.total,
+        'attempts': job.attempts,
+        'errors': job.errors,
+        'last_error': job.last_error,
+        'created': job.created.isoformat(),
+        'expires_at': job.expires_at.isoformat(),
+    }
+
+
+def work(cache: DxfCache, service: GenerationService, once: bool = False, poll: float = 1.0,
+         cleanup_every: float = 60.0):
+    """Petla workera: oproznianie kolejki, co cleanup_every sekund sprzatanie wygaslych zadan"""
+    last_cleanup = float('-inf')
+    while True:
+        if time.monotonic() - last_cleanup > cleanup_every:
+            cleanup_jobs()
+            last_cleanup = time.monotonic()
+        job = claim_job()
+        if job is not None:
+            run_job(job, cache, service)
+            continue
+        if once:
+            return
+        time.sleep(poll)
+
@@ -0,0 +1,88 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from calc.app.benchmark import THRESHOLDS, best_of, compare, corpus, measure, run_suite
+from calc.app.mainclass import DXF_FORMATS, DxfElement
+
+
+class Command(BaseCommand):
+    help = ("Pomiary generatora DXF na stalym zestawie belek (calc.app.benchmark.corpus) i porownanie z zapisanymi "
+            "wartosciami bazowymi - blad, gdy metryka pogorszyla sie ponad prog. --formats - ASCII/binarny")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=7, help="liczba budowan kazdej belki")
+        parser.add_argument('--baseline', default=settings.DXF_BENCHMARK_BASELINE, help="plik JSON z wartosciami bazowymi")
+        parser.add_argument('--save', action='store_true', help="zapisz wyniki jako nowe wartosci bazowe")
+        parser.add_argument('--threshold', type=float, default=THRESHOLDS['time'],
+                            help="dopuszczalny wzrost czasow (0.25 - o 25%%)")
+        parser.add_argument('--seed', type=int, default=2022, help="ziarno losowania typowych belek")
+        parser.add_argument('--formats', action='store_true', help="porownanie rozmiaru i czasu zapisu ASCII/binarny")
+        parser.add_argument('--dxfversion', default='R2018')
+
+    def handle(self, *args, **options):
+        beams = [dict(params, dxfversion=options['dxfversion']) for params in corpus(seed=options['seed'])]
+        repeat = max(1, options['repeat'])
+        if options['formats']:
+            self.compare_formats(beams, repeat)
+            return
+
+        results = run_suite(beams, repeat)
+        self.stdout.write(f"{'beam':<11} {'total [ms]':>10} {'memory [kB]':>12} {'entities':>9} {'size [B]':>9}  "
+                          f"slowest stages")
+        for name, metrics in results.items():
+            slowest = sorted(metrics['stages'].items(), key=lambda item: -item[1])[:3]
+            self.stdout.write(f"{name:<11} {metrics['total']:>10.2f} {metrics['peak_memory_kb']:>12.1f} "
+                              f"{metrics['entities']:>9} {metrics['size']:>9}  "
+                              + ', '.join(f'{stage} {duration:.1f}' for stage, duration in slowest))
+
+        document = {'seed': options['seed'], 'repeat': repeat, 'dxfversion': options['dxfversion'], 'beams': results}
+        if options['save']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(document, file, indent=2)
+                file.write('\n')
+            self.stdout.write(f"baseline saved: {options['baseline']}")
+            return
+
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(f"no baseline {options['baseline']}, run with --save first")
+        if baseline.get('seed') != options['seed'] or baseline.get('dxfversion') != options['dxfversion']:
+            raise CommandError("baseline was recorded for another corpus (seed/dxfversion)")
+
+        thresholds = {'time': options['threshold']}
+        regressions = compare(results, baseline['beams'], thresholds)
+        if regressions:
+            # potwierdzenie: ponowny pomiar belek z pogorszeniem, liczy sie lepszy wynik (szum od innych procesow)
+            for params in beams:
+                if any(name == params['name'] for name, *_ in regressions):
+                    results[params['name']] = best_of(results[params['name']], measure(params, repeat))
+            regressions = compare(results, baseline['beams'], thresholds)
+        for name, metric, value, base_value, threshold in regressions:
+            self.stderr.write(f"{name}: {metric} {value} > {base_value} (+{threshold:.0%})")
+        if regressions:
+            raise CommandError(f"{len(regressions)} metrics regressed")
+        self.stdout.write("no regressions")
+
+    def compare_formats(self, beams: list[dict], repeat: int):
+        self.stdout.write(f"{'beam':<11} {'format':<7} {'size [B]':>10} {'ratio':>6} {'write [ms]':>11} {'ratio':>6}")
+        for params in beams:
+            element = DxfElement(**params)
+            results = {}
+            for format in DXF_FORMATS:
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    data = element.to_bytes(format)
+                    times.append(time.perf_counter() - start)
+                results[format] = (len(data), statistics.median(times) * 1000)
+
+            size_ascii, time_ascii = results['ascii']
+            for format, (size, write_time) in results.items():
+                self.stdout.write(f"{params['name']:<11} {format:<7} {size:>10} {size / size_ascii:>6.2f} "
+                                  f"{write_time:>11.2f} {write_time / time_ascii:>6.2f}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from calc.jobs import cleanup_jobs, work
+from calc.views import get_dxf_cache, get_generation_service
+
+
+class Command(BaseCommand):
+    help = "Worker kolejki zadan generowania DXF (GenerationJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="zakoncz po oproznieniu kolejki")
+        parser.add_argument('--poll', type=float, default=1.0, help="odstep sprawdzania pustej kolejki [s]")
+        parser.add_argument('--cleanup', action='store_true', help="tylko sprzatanie wygaslych zadan")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.stdout.write(f"expired jobs: {cleanup_jobs()}")
+            return
+        try:
+            work(get_dxf_cache(), get_generation_service(), once=options['once'], poll=options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            get_generation_service().shutdown()
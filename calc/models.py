@@ -1,3 +1,43 @@
+import uuid
+
 from django.db import models
 
 # Create your models here.
+
+
+class GenerationJob(models.Model):
+    """Zadanie generowania wielu belek w tle (kolejka w db.sqlite3, obslugiwana przez manage.py dxf_worker)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [(QUEUED, 'queued'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed'),
+                      (EXPIRED, 'expired')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    output = models.CharField(max_length=3, default='zip')
+    items = models.JSONField(default=list)
+    errors = models.JSONField(default=list)
+    total = models.IntegerField(default=0)
+    progress = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    artifact = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    # ostatni znak zycia workera (pobranie zadania, postep) - wg niego cleanup_jobs uznaje zadanie za porzucone
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    # nowy przy kazdym pobraniu zadania: plik tymczasowy proby i zapis wyniku tylko przez biezacego workera
+    claim_token = models.UUIDField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "generation_job"
+        ordering = ['created']
+
+    def __str__(self):
+        return f'{self.id} {self.status}'
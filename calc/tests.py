@@ -1,3 +1,835 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import ezdxf
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import urlencode
+from ezdxf import bbox
+from ezdxf.lldxf.const import DXFVersionError
+from ezdxf.tools.standards import linetypes
+
+from calc import jobs, views
+from calc.app import mainclass, template
+from calc.app.bar_layout import solve_bar_layout
+from calc.app.batch import build_combined, build_files, parse_rows, read_rows
+from calc.app.benchmark import THRESHOLDS, best_of, compare, corpus
+from calc.app.cache import DxfCache, cache_key
+from calc.app.compression import negotiate_encoding
+from calc.app.cost import BuildTimeout, Watchdog, estimate_cost
+from calc.app.engine import GenerationBusy, GenerationLimiter, GenerationService, GenerationTimeout
+from calc.app.mainclass import LANGUAGES, DxfElement, block_number, iter_chunks, uniform_runs
+from calc.app.model import BeamModel
+from calc.app.params import parse_model_params
+from calc.app.singleflight import FileLock, SingleFlight
+from calc.app.spacing import SPACING_STEP, admissible_spacing, remainder, solve_stirrup_spacing
+from calc.app.steel_bill import SteelBill
+from calc.app.sweep import SweepError, beam_sweep
+from calc.app.table import TableGrid
+from calc.app.template import DrawingTemplate
+from calc.app.timing import StageTimer, TimingStats, percentile
+from calc.models import GenerationJob
+
+# strzemiona co 1 mm na calej rozpietosci - ponad budzet kosztu
+HUGE = {'beam_span': 15000, 'first_row_stirrup_range_left': 7000, 'first_row_stirrup_range_right': 7000,
+        'first_row_stirrup_spacing_left': 1, 'first_row_stirrup_spacing_right': 1}
+
+# kazda warstwa pretow osobno miesci sie w przekroju, gorna i dolna razem nachodza na siebie
+OVERLAPPING = {'beam_height': 300, 'beam_width': 150, 'diameter_main_top': 24, 'quantity_main_top': 7,
+               'diameter_main_bottom': 16, 'quantity_main_bottom': 12, 'diameter_stirrup': 8, 'cover_top': 30,
+               'cover_bottom': 30, 'cover_left': 30, 'cover_right': 30}
+
+# typowa belka z zakresow losowania calc/app/beam.py
+BEAM = {
+    'name': 'B1', 'beam_span': 3800, 'beam_height': 400, 'beam_width': 300, 'width_support_left': 350,
+    'width_support_right': 250, 'diameter_main_top': 28, 'quantity_main_top': 2, 'steel_grade_main_top': 'B500SP',
+    'diameter_main_bottom': 28, 'quantity_main_bottom': 5, 'steel_grade_main_bottom': 'B500SP',
+    'diameter_stirrup': 8, 'steel_grade_stirrup': 'B500SP', 'cover_top': 75, 'cover_bottom': 15,
+    'cover_view_left': 75, 'cover_view_right': 45, 'cover_left': 35, 'cover_right': 65,
+    'first_row_stirrup_range_left': 795, 'first_row_stirrup_range_right': 708,
+    'first_row_stirrup_spacing_left': 245, 'first_row_stirrup_spacing_right': 235,
+    'secondary_stirrup_spacing': 400, 'number_of_elements': 1, 'language': 'pl',
+}
+
+
+def beam(**changes) -> dict:
+    return dict(BEAM, **changes)
+
+
+def loop_spacing(rest: float, spacing: int, max_leftover: float = 60) -> int:
+    """Dobor rozstawu jak przed solve_stirrup_spacing: zmniejszanie co 5 mm az reszta <= max_leftover"""
+    while remainder(rest, spacing) > max_leftover:
+        spacing -= SPACING_STEP
+    return spacing
+
+
+class DxfCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_key_normalized(self):
+        params = beam()
+        self.assertEqual(cache_key(params), cache_key(dict(params, name=f" {params['name']} ")))
+        self.assertEqual(cache_key(dict(params, beam_span=5000)), cache_key(dict(params, beam_span=5000.0)))
+        self.assertNotEqual(cache_key(params), cache_key(params, version='old'))
+        self.assertNotEqual(cache_key(params), cache_key(dict(params, name='other')))
+
+    def test_lru_eviction(self):
+        cache = DxfCache(self.directory, max_bytes=30)
+        cache.put('a', b'a' * 10)
+        cache.put('b', b'b' * 10)
+        cache.put('c', b'c' * 10)
+        self.assertEqual(cache.get('a'), b'a' * 10)
+        cache.put('d', b'd' * 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'a' * 10)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_other_version_removed(self):
+        DxfCache(self.directory, version='old').put('a', b'a')
+        os.makedirs(os.path.join(self.directory, 'locks'))
+        cache = DxfCache(self.directory, version='new')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['entries'], 0)
+        # katalogi spoza cache zostaja
+        self.assertEqual(sorted(os.listdir(self.directory)), ['locks', 'vnew'])
+
+
+class InMemoryOutputTests(SimpleTestCase):
+    def test_bytes_readable(self):
+        drawing = DxfElement(**beam())
+        entities = len(drawing.msp)
+        document = ezdxf.read(io.StringIO(drawing.to_bytes().decode(drawing.drawing.output_encoding)))
+        self.assertEqual(len(document.modelspace()), entities)
+
+    def test_binary_readable(self):
+        drawing = DxfElement(**beam(), format='binary')
+        data = drawing.to_bytes()
+        self.assertTrue(data.startswith(b'AutoCAD Binary DXF'))
+        path = os.path.join(tempfile.mkdtemp(), 'binary.dxf')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'wb') as file:
+            file.write(data)
+        self.assertEqual(len(ezdxf.readfile(path).modelspace()), len(drawing.msp))
+        self.assertLess(len(data), len(drawing.to_bytes('ascii')))
+        with self.assertRaises(ValueError):
+            drawing.to_bytes('pdf')
+
+    def test_chunks(self):
+        data = bytes(range(256)) * 10
+        chunks = list(iter_chunks(data, chunk_size=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 560])
+        self.assertEqual(b''.join(chunks), data)
+
+
+class DrawingTemplateTests(SimpleTestCase):
+    def test_linetype_pattern_in_every_document(self):
+        source = ezdxf.new(dxfversion='R2018', setup=['linetypes'])
+        source.layers.new('hidden', dxfattribs={'linetype': 'DASHED'})
+        template = DrawingTemplate(source)
+        first, second = (template.new_document().linetypes.get('DASHED').pattern_tags.tags for _ in range(2))
+        pattern = next(pattern for name, _, pattern in linetypes() if name == 'DASHED')
+        # kreska i przerwa, nie sama linia ciagla
+        self.assertEqual([tag.value for tag in first if tag.code == 49], pattern[1:])
+        self.assertEqual(second, first)
+
+    def test_templated_drawing_has_resources(self):
+        first, second = (DxfElement(**beam()).drawing for _ in range(2))
+        for table_name in ('layers', 'styles', 'dimstyles'):
+            names = {entry.dxf.name for entry in getattr(first, table_name)}
+            self.assertEqual({entry.dxf.name for entry in getattr(second, table_name)}, names, table_name)
+        for name in ('marker', 'marker_section', 'reinforcement_description'):
+            self.assertEqual(len(second.blocks.get(name)), len(first.blocks.get(name)), name)
+
+    def test_first_drawing_in_process_from_template(self):
+        # bez zarejestrowanych szablonow - jak w nowym procesie
+        with mock.patch.dict(template._templates, clear=True):
+            first, second = (DxfElement(**beam()).drawing for _ in range(2))
+            self.assertEqual([linetype.dxf.name for linetype in first.linetypes],
+                             [linetype.dxf.name for linetype in second.linetypes])
+            self.assertEqual(len(first.entitydb), len(second.entitydb))
+
+
+class GenerationServiceTests(SimpleTestCase):
+    def test_inline(self):
+        service = GenerationService(max_workers=0)
+        data = service.generate(beam())
+        self.assertEqual(data.split()[-1], b'EOF')
+        # blad budowania dociera do wywolujacego bez zmian
+        with self.assertRaises(DXFVersionError):
+            service.generate(beam(dxfversion='R9999'))
+
+    def test_pool_recovers_after_timeout(self):
+        service = GenerationService(max_workers=1, timeout=30)
+        self.addCleanup(service.shutdown)
+        with self.assertRaises(GenerationTimeout):
+            service.result(service.submit(time.sleep, 10), timeout=0.5)
+        self.assertEqual(service.result(service.submit(sum, [1, 2])), 3)
+
+    def test_timeout_fails_other_builds_of_the_pool(self):
+        service = GenerationService(max_workers=2, timeout=30)
+        self.addCleanup(service.shutdown)
+        hung, other = service.submit(time.sleep, 10), service.submit(time.sleep, 5)
+        with self.assertRaises(GenerationTimeout):
+            service.result(hung, timeout=0.5)
+        # zadanie z zabitej puli - GenerationBusy (503 z Retry-After), kolejne na nowej puli
+        with self.assertRaises(GenerationBusy):
+            service.result(other)
+        self.assertEqual(service.generate(beam()).split()[-1], b'EOF')
+
+    def test_worker_replaced_after_max_tasks(self):
+        service = GenerationService(max_workers=1, timeout=30, max_tasks_per_worker=2)
+        self.addCleanup(service.shutdown)
+        pids = [service.result(service.submit(os.getpid)) for _ in range(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_limiter(self):
+        limiter = GenerationLimiter(max_pending=2)
+        self.assertTrue(limiter.acquire() and limiter.acquire())
+        self.assertFalse(limiter.acquire())
+        limiter.release()
+        self.assertTrue(limiter.acquire())
+        self.assertEqual(limiter.rejected, 1)
+
+
+class ViewTestCase(SimpleTestCase):
+    """Widoki z cache w katalogu tymczasowym i budowaniem w biezacym watku"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(DXF_CACHE_DIR=self.directory, DXF_LOCK_DIR=self.directory + '/locks',
+                                     DXF_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for factory in (views.get_dxf_cache, views.get_generation_service, views.get_generation_limiter,
+                        views.get_timing_stats, views.get_single_flight):
+            factory.cache_clear()
+            self.addCleanup(factory.cache_clear)
+
+
+class BatchTests(ViewTestCase):
+    def test_read_rows(self):
+        rows = read_rows(b'name;beam_span\nB1;3000\nB2;4000\n')
+        self.assertEqual(rows, [{'name': 'B1', 'beam_span': '3000'}, {'name': 'B2', 'beam_span': '4000'}])
+        self.assertEqual(read_rows(json.dumps({'beams': [beam()]}).encode()), [beam()])
+
+    def test_parse_rows_reports_bad_rows(self):
+        items, errors = parse_rows([beam(), beam(beam_span='abc'), {'name': 'B3'}])
+        self.assertEqual([row for row, _ in items], [1])
+        self.assertEqual([error['row'] for error in errors], [2, 3])
+
+    def test_zip_with_row_errors(self):
+        rows = [beam(name='B1'), beam(name='B2', dxfversion='R9999'), beam(name='B3')]
+        response = self.client.post('/beam/download_dxf_batch', json.dumps(rows), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['001_B1.dxf', '003_B3.dxf', 'errors.json'])
+        self.assertEqual([error['row'] for error in json.loads(archive.read('errors.json'))], [2])
+
+    def test_combined_skips_failed_row(self):
+        items, _ = parse_rows([beam(name='B1'), beam(name='B2', beam_width=-300), beam(name='B3')])
+        data, errors = build_combined(items)
+        self.assertEqual([error['row'] for error in errors], [2])
+        single, _ = build_combined(items[:1])
+        self.assertGreater(len(data), len(single))
+
+    def test_combined_removes_blocks_of_failed_row(self):
+        items, _ = parse_rows([beam(name='B1'), beam(name='B2', diameter_stirrup=12), beam(name='B3')])
+        create_table = DxfElement.create_table
+
+        def failing_create_table(element, **kwargs):
+            create_table(element, **kwargs)
+            if element.name == 'B2':
+                raise ValueError('table failed')
+
+        with mock.patch.object(DxfElement, 'create_table', failing_create_table):
+            data, errors = build_combined(items)
+        self.assertEqual([error['row'] for error in errors], [2])
+        expected, _ = build_combined(items[::2])
+        blocks = ({block.name for block in ezdxf.read(io.StringIO(output.decode('utf-8'))).blocks}
+                  for output in (data, expected))
+        self.assertEqual(next(blocks), next(blocks))
+
+    def test_combined_rejects_other_dxfversion(self):
+        items, _ = parse_rows([beam(name='B1'), beam(name='B2', dxfversion='R2010')])
+        data, errors = build_combined(items)
+        self.assertEqual([error['row'] for error in errors], [2])
+        self.assertIn('dxfversion', errors[0]['error'])
+
+    def test_files_bounded_and_resubmitted(self):
+        service = GenerationService(max_workers=0)
+        items, _ = parse_rows([beam(name=f'B{row}') for row in range(1, 6)])
+        submitted = []
+        submit, result = service.submit, service.result
+
+        def counting_submit(*args):
+            submitted.append(args)
+            return submit(*args)
+
+        def busy_once(future):
+            # pierwszy wiersz utracony razem z zabita pula
+            if len(submitted) <= 2:
+                raise GenerationBusy('generation pool was restarted')
+            return result(future)
+
+        cache = DxfCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache.root)
+        with mock.patch.object(service, 'submit', counting_submit), mock.patch.object(service, 'result', busy_once):
+            files = build_files(items, [], cache, service)
+            self.assertEqual(next(files)[0], '001_B1.dxf')
+            # 2 wiersze w toku (2 na proces), pierwszy ponowiony
+            self.assertEqual(len(submitted), 3)
+            self.assertEqual([name for name, _ in files], [f'00{row}_B{row}.dxf' for row in range(2, 6)])
+
+
+class GenerationJobTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(DXF_CACHE_DIR=self.directory + '/cache', DXF_JOB_DIR=self.directory + '/jobs')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache = DxfCache(self.directory + '/cache')
+        self.service = GenerationService(max_workers=0)
+
+    def test_job_done_and_downloaded(self):
+        rows = [beam(name='B1'), beam(name='B2', beam_span='abc')]
+        response = self.client.post('/beam/jobs', json.dumps(rows), content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        jobs.work(self.cache, self.service, once=True)
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], GenerationJob.DONE)
+        self.assertEqual(status['progress'], 1)
+        self.assertEqual([error['row'] for error in status['errors']], [2])
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(self.client.get(status['download_url']).streaming_content)))
+        self.assertEqual(archive.namelist(), ['001_B1.dxf', 'errors.json'])
+
+    def test_over_budget_download_queued(self):
+        response = self.client.post('/beam/download_dxf_beam', beam(**HUGE))
+        self.assertEqual(response.status_code, 202)
+        self.assertIn('stirrups', response.json()['over_budget'])
+        self.assertEqual(GenerationJob.objects.get(id=response.json()['id']).output, 'dxf')
+
+    def test_combined_job_without_beams_failed(self):
+        job = jobs.submit_job([(1, beam(beam_width=-300))], [], 'dxf')
+        jobs.work(self.cache, self.service, once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.FAILED)
+        self.assertEqual((job.attempts, job.artifact), (1, ''))
+        self.assertEqual([error['row'] for error in job.errors], [1])
+
+    def test_stale_job_requeued_and_expired_removed(self):
+        job = jobs.submit_job([(1, beam())], [])
+        # dlugo trwajace zadanie z biezacym biciem serca nie jest porzucone
+        GenerationJob.objects.filter(id=job.id).update(status=GenerationJob.RUNNING, attempts=1,
+                                                      started=timezone.now() - timedelta(hours=1),
+                                                      heartbeat=timezone.now())
+        jobs.cleanup_jobs()
+        self.assertEqual(GenerationJob.objects.get(id=job.id).status, GenerationJob.RUNNING)
+        GenerationJob.objects.filter(id=job.id).update(heartbeat=timezone.now() - timedelta(hours=1))
+        jobs.cleanup_jobs()
+        self.assertEqual(GenerationJob.objects.get(id=job.id).status, GenerationJob.QUEUED)
+
+        jobs.work(self.cache, self.service, once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.DONE)
+        GenerationJob.objects.filter(id=job.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.cleanup_jobs(), 1)
+        self.assertFalse(os.path.exists(job.artifact))
+        self.assertEqual(GenerationJob.objects.get(id=job.id).status, GenerationJob.EXPIRED)
+
+    def test_abandoned_attempt_does_not_overwrite(self):
+        jobs.submit_job([(1, beam())], [])
+        abandoned = jobs.claim_job()
+        GenerationJob.objects.filter(id=abandoned.id).update(status=GenerationJob.QUEUED)
+        current = jobs.claim_job()
+        self.assertNotEqual(current.claim_token, abandoned.claim_token)
+        jobs.run_job(abandoned, self.cache, self.service)
+        self.assertEqual(GenerationJob.objects.get(id=current.id).status, GenerationJob.RUNNING)
+        self.assertEqual(os.listdir(settings.DXF_JOB_DIR), [])
+        # plik tymczasowy proby przerwanej w trakcie zapisu zostaje do wygasniecia zadania
+        temp_path = f'{jobs.artifact_path(abandoned)}.{abandoned.claim_token}.tmp'
+        open(temp_path, 'wb').close()
+        jobs.run_job(current, self.cache, self.service)
+        self.assertEqual(GenerationJob.objects.get(id=current.id).status, GenerationJob.DONE)
+        GenerationJob.objects.filter(id=current.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        jobs.cleanup_jobs()
+        self.assertEqual(os.listdir(settings.DXF_JOB_DIR), [])
+
+
+
+class LabelBlockTests(SimpleTestCase):
+    def test_labels_without_anonymous_blocks(self):
+        drawing = DxfElement(**beam())
+        self.assertEqual([block.name for block in drawing.drawing.blocks if block.name.startswith('*U')], [])
+        markers = drawing.msp.query('INSERT[name=="marker"]')
+        self.assertTrue(markers)
+        for insert in markers:
+            self.assertTrue(insert.get_attrib_text('NUMBER'))
+
+
+class StirrupViewTests(SimpleTestCase):
+    def test_uniform_runs(self):
+        self.assertEqual(uniform_runs([0, 100, 200, 300, 450, 600, 700]), [(0, 100, 4), (450, 150, 2), (700, 0, 1)])
+        self.assertEqual(uniform_runs([]), [])
+
+    def test_one_insert_per_run(self):
+        drawing = DxfElement(**beam())
+        inserts = drawing.msp.query('INSERT[name ? "stirrup_view_.*"]')
+        self.assertLess(len(inserts), drawing.count_stirrups)
+        self.assertEqual(sum(insert.dxf.column_count for insert in inserts), drawing.count_stirrups)
+
+    def test_block_number_exact(self):
+        self.assertEqual(block_number(310), '310')
+        self.assertEqual(block_number(12.5), '12.5')
+        self.assertNotEqual(block_number(1234567.5), block_number(1234567.0))
+
+
+class BarSectionTests(SimpleTestCase):
+    def test_one_block_per_diameter(self):
+        drawing = DxfElement(**beam(diameter_main_top=20, diameter_main_bottom=16))
+        counts = {name: len(drawing.msp.query(f'INSERT[name=="{name}"]')) for name in ('bar_section_20',
+                                                                                       'bar_section_16')}
+        self.assertEqual(counts, {'bar_section_20': 2, 'bar_section_16': 5})
+        self.assertEqual(len(drawing.msp.query('CIRCLE')), 0)
+        self.assertEqual(len(drawing.drawing.blocks.get('bar_section_16').query('CIRCLE')), 1)
+
+    def test_close_diameters_separate_blocks(self):
+        drawing = DxfElement(**beam())
+        names = [drawing._block_bar_section(diameter) for diameter in (16, 16.0000001)]
+        self.assertNotEqual(names[0], names[1])
+        radius = drawing.drawing.blocks.get(names[1]).query('CIRCLE')[0].dxf.radius
+        self.assertEqual(radius, 16.0000001 / 2)
+
+
+class StirrupSpacingTests(SimpleTestCase):
+    def test_same_spacing_as_loop(self):
+        rng = random.Random(10)
+        for _ in range(2000):
+            rest = rng.randrange(300, 15000)
+            spacing = rng.randrange(SPACING_STEP, 405, SPACING_STEP)
+            self.assertEqual(admissible_spacing(rest, spacing), loop_spacing(rest, spacing), (rest, spacing))
+
+    def test_invalid_spacing_raises_before_solving(self):
+        with self.assertRaises(ValueError):
+            admissible_spacing(5000, 0)
+        with self.assertRaises(ValueError):
+            solve_stirrup_spacing(1000, 200, range_left=800, spacing_left=100, range_right=800, spacing_right=100)
+
+    def test_leftover_within_limit(self):
+        layout = solve_stirrup_spacing(5000, 200, 1000, 100, 1000, 100)
+        self.assertLessEqual(layout.leftover, 60)
+        self.assertEqual(layout.positions, sorted(set(layout.positions)))
+
+
+class BarLayoutTests(SimpleTestCase):
+    def test_layers_fit(self):
+        layout = solve_bar_layout(300, 500, 30, 30, 30, 8, 16, 20, 4)
+        self.assertTrue(layout.fits)
+        self.assertEqual(layout.quantity, 4)
+
+    def test_extra_bars_in_next_layers(self):
+        layout = solve_bar_layout(250, 500, 30, 30, 30, 8, 16, 16, 12)
+        self.assertGreater(len(layout.rows), 1)
+        self.assertEqual(layout.quantity, 12)
+
+    def test_top_and_bottom_overlap(self):
+        model = BeamModel(**parse_model_params(beam(**OVERLAPPING)))
+        self.assertTrue(model.bar_layout('top').fits and model.bar_layout('bottom').fits)
+        self.assertFalse(model.bars_fit)
+        self.assertEqual(model.quantities()['warnings'], [BeamModel.BAR_LAYOUT_WARNING])
+
+    def test_warning_on_drawing(self):
+        texts = [text.dxf.text for text in DxfElement(**beam(**OVERLAPPING)).msp.query('TEXT')]
+        self.assertEqual(texts.count(BeamModel.BAR_LAYOUT_WARNING), 1)
+        self.assertEqual(BeamModel(**parse_model_params(beam())).quantities()['warnings'], [])
+
+
+class SteelBillTests(SimpleTestCase):
+    def test_numbering_and_grades(self):
+        bill = SteelBill()
+        bill.add('B2', 16, 3, 5000, 'B500SP')
+        bill.add('B1', 8, 20, 1200, 'B500A')
+        bill.add('B1', 20, 4, 5200, 'B500SP')
+        self.assertEqual([bar['number'] for bar in bill], [1, 2, 3])
+        self.assertEqual(bill[2]['diameter'], 20)
+        self.assertEqual(bill.grades(), {'B500SP': [16, 20], 'B500A': [8]})
+        self.assertEqual(bill.elements(), ['B1', 'B2'])
+
+    def test_schedule_totals(self):
+        bill = SteelBill()
+        bill.add('B1', 16, 3, 5000, 'B500SP')
+        bill.add('B1', 20, 4, 5200, 'B500SP')
+        bill.add('B1', 16, 2, 1000, 'B500A')
+        bill.add('B1', 16, 1, 2500, 'B500SP')
+        schedule = bill.schedule(2, lambda diameter: diameter / 10)
+        self.assertEqual(schedule.columns, (('B500SP', 16), ('B500SP', 20), ('B500A', 16)))
+        self.assertEqual(schedule.total_length, (35.0, 41.6, 4.0))
+        self.assertEqual(schedule.mass, (56.0, 83.2, 6.4))
+        self.assertAlmostEqual(schedule.mass_total, 145.6)
+        self.assertEqual(schedule.rows[3], (5.0, '-', '-'))
+
+
+class TableGridTests(SimpleTestCase):
+    def test_shared_edges_merged(self):
+        grid = TableGrid()
+        for column in range(3):
+            for row in range(2):
+                grid.add_rectangle(column * 10, row * 5, (column + 1) * 10, (row + 1) * 5)
+        lines = list(grid.lines())
+        # 3 linie poziome na cala szerokosc i 4 pionowe na cala wysokosc
+        self.assertEqual(len(lines), 7)
+        self.assertIn(((0, 5), (30, 5)), lines)
+        self.assertIn(((10, 0), (10, 10)), lines)
+
+    def test_separate_segments_kept(self):
+        grid = TableGrid()
+        grid.add_rectangle(0, 0, 10, 5)
+        grid.add_rectangle(20, 0, 30, 5)
+        self.assertIn(((0, 0), (10, 0)), list(grid.lines()))
+        self.assertIn(((20, 0), (30, 0)), list(grid.lines()))
+
+
+class DrawingExtentsTests(SimpleTestCase):
+    def test_tracked_extents_close_to_exact(self):
+        for changes in ({}, {'number_of_elements': 3, 'beam_span': 9000}, {'language': 'de'}):
+            drawing = DxfElement(**beam(**changes))
+            exact = bbox.extents(drawing.msp)
+            tolerance = 0.02 * max(exact.size.x, exact.size.y)
+            for tracked, point in ((drawing.extents.extmin, exact.extmin), (drawing.extents.extmax, exact.extmax)):
+                self.assertAlmostEqual(tracked.x, point.x, delta=tolerance, msg=changes)
+                self.assertAlmostEqual(tracked.y, point.y, delta=tolerance, msg=changes)
+
+
+class QuantitiesTests(SimpleTestCase):
+    def test_model_matches_drawing(self):
+        drawing = DxfElement(**beam())
+        quantities = BeamModel(**parse_model_params(beam())).quantities()
+        self.assertEqual(quantities['stirrups']['count'], drawing.count_stirrups)
+        self.assertEqual([bar['length'] for bar in quantities['bars']], [bar['length'] for bar in drawing.steel_bill])
+
+    def test_endpoint_rows(self):
+        rows = [beam(name='B1'), beam(name='B2', beam_span='abc')]
+        data = self.client.post('/beam/quantities', json.dumps(rows), content_type='application/json').json()
+        self.assertEqual([quantities['name'] for quantities in data['beams']], ['B1'])
+        self.assertEqual([error['row'] for error in data['errors']], [2])
+        response = self.client.get('/beam/quantities', beam())
+        self.assertEqual(response.json()['stirrups'], data['beams'][0]['stirrups'])
+
+
+class BeamSweepTests(SimpleTestCase):
+    def test_same_as_model(self):
+        base = beam(number_of_elements=2)
+        result = beam_sweep(base, {'beam_span': [3000, 4500, 6000], 'secondary_stirrup_spacing': [150, 250]},
+                            limit=10)
+        self.assertEqual(result['points'], 6)
+        self.assertEqual(len(result['table']), 6)
+        for row in result['table']:
+            model = BeamModel(**parse_model_params(dict(base, beam_span=row['beam_span'],
+                                                        secondary_stirrup_spacing=row['secondary_stirrup_spacing'])))
+            self.assertEqual(row['count_stirrups'], model.count_stirrups)
+            self.assertEqual(row['stirrup_spacing'], model.stirrup_layout.spacing)
+            self.assertAlmostEqual(row['mass_total'], model.schedule().mass_total, places=1)
+
+    def test_unknown_field(self):
+        with self.assertRaises(SweepError):
+            beam_sweep(beam(), {'language': ['pl', 'de']})
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    def test_negotiate(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(negotiate_encoding('*'), 'gzip')
+        self.assertIsNone(negotiate_encoding('gzip;q=0, identity'))
+        self.assertIsNone(negotiate_encoding(''))
+
+
+class LanguageTests(SimpleTestCase):
+    def test_language_per_element(self):
+        elements = {language: DxfElement(**beam(language=language)) for language in ('pl', 'de', 'xx')}
+        self.assertIs(elements['pl'].lang, LANGUAGES['pl'])
+        self.assertIs(elements['de'].lang, LANGUAGES['de'])
+        self.assertIs(elements['xx'].lang, LANGUAGES['eng'])
+        with self.assertRaises(TypeError):
+            LANGUAGES['pl']['mark'] = 'changed'
+
+
+class TimingTests(SimpleTestCase):
+    def test_stage_timer(self):
+        timer = StageTimer()
+        items = []
+        with timer.stage('fill', count=lambda: len(items)):
+            items.extend(range(3))
+        self.assertEqual([(name, entities) for name, _, entities in timer.stages], [('fill', 3)])
+        self.assertIsNone(StageTimer(enabled=False).stage('fill').__enter__())
+
+    def test_percentiles(self):
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        stats = TimingStats(window=10)
+        stats.record([('save', float(value), 1) for value in range(20)])
+        self.assertEqual(stats.stats()['save']['count'], 10)
+        self.assertEqual(stats.stats()['save']['p50'], 14.0)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def metrics(self, total: float, size: int) -> dict:
+        return {'stages': {'save': total / 2}, 'total': total, 'peak_memory_kb': 100.0, 'entities': 200,
+                'size': size}
+
+    def test_corpus_fixed(self):
+        self.assertEqual(corpus(), corpus())
+        self.assertEqual([params['name'] for params in corpus()][::7], ['small', 'worst'])
+
+    def test_compare(self):
+        baseline = {'B1': self.metrics(40.0, 1000)}
+        self.assertEqual(compare({'B1': self.metrics(45.0, 1010)}, baseline), [])
+        regressions = compare({'B1': self.metrics(60.0, 1100), 'B2': self.metrics(1.0, 1)}, baseline)
+        self.assertEqual([metric for _, metric, *_ in regressions], ['save [ms]', 'total [ms]', 'size [B]'])
+        self.assertEqual(regressions[1][4], THRESHOLDS['time'])
+        # czasy ponizej progu szumu nie sa regresja
+        self.assertEqual(compare({'B1': self.metrics(1.5, 1000)}, {'B1': self.metrics(1.0, 1000)}), [])
+
+    def test_best_of(self):
+        best = best_of(self.metrics(60.0, 1000), self.metrics(45.0, 1200))
+        self.assertEqual((best['total'], best['stages']['save'], best['size']), (45.0, 22.5, 1000))
+
+
+class DeterministicOutputTests(SimpleTestCase):
+    def test_same_bytes(self):
+        params = beam()
+        for format in ('ascii', 'binary'):
+            first = DxfElement(**params, deterministic=True).to_bytes(format)
+            time.sleep(0.01)
+            second = DxfElement(**params, deterministic=True).to_bytes(format)
+            self.assertEqual(hashlib.sha256(first).digest(), hashlib.sha256(second).digest(), format)
+        self.assertFalse(ezdxf.options.write_fixed_meta_data_for_testing)
+
+    def test_default_output_not_fixed(self):
+        data = DxfElement(**beam()).to_bytes()
+        # bez trybu deterministycznego - GUID wersji nowy przy kazdym zapisie
+        self.assertNotEqual(ezdxf.read(io.StringIO(data.decode('utf-8'))).header['$VERSIONGUID'],
+                            '{00000000-0000-0000-0000-000000000000}')
+
+    def test_plain_writes_not_serialised(self):
+        plain = DxfElement(**beam())
+        fixed = DxfElement(**beam(), deterministic=True)
+        with mainclass._metadata_lock.shared():
+            # zwykly zapis nie czeka na inny zwykly zapis
+            writer = threading.Thread(target=plain.to_bytes)
+            writer.start()
+            writer.join(10)
+            self.assertFalse(writer.is_alive())
+            # zapis deterministyczny przelacza opcje ezdxf - czeka, az zwykle zapisy sie skoncza
+            writer = threading.Thread(target=fixed.to_bytes)
+            writer.start()
+            writer.join(0.2)
+            self.assertTrue(writer.is_alive())
+        writer.join(10)
+        self.assertFalse(writer.is_alive())
+
+    def test_cache_key_per_mode(self):
+        self.assertNotEqual(cache_key(beam()), cache_key(beam(), deterministic=True))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return b'dxf'
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', build))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertTrue(all(result == b'dxf' for result, _ in results))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_error_shared(self):
+        flight = SingleFlight()
+
+        def build():
+            raise ValueError("bad beam")
+
+        with self.assertRaises(ValueError):
+            flight.do('key', build)
+        self.assertEqual(flight.do('key', lambda: 1), (1, False))
+
+    def test_file_lock(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        first, second = FileLock(directory + '/key.lock'), FileLock(directory + '/key.lock')
+        self.assertTrue(first.try_acquire())
+        self.assertFalse(second.try_acquire())
+        first.release()
+        self.assertTrue(second.try_acquire())
+        second.release()
+
+
+class CostEstimateTests(SimpleTestCase):
+    def test_close_to_model(self):
+        for params in corpus():
+            estimate = estimate_cost(params)
+            count = BeamModel(**parse_model_params(params)).count_stirrups
+            self.assertGreaterEqual(estimate.stirrups, count, params['name'])
+            self.assertLessEqual(estimate.stirrups, count + 2, params['name'])
+
+    def test_over_budget(self):
+        cost = estimate_cost(beam(**HUGE))
+        self.assertIn('stirrups', cost.over({'stirrups': 5000}))
+        self.assertEqual(estimate_cost(beam()).over({'stirrups': 5000}), {})
+
+    def test_watchdog_between_stages(self):
+        errors = []
+
+        def build():
+            with Watchdog(0.01) as watchdog:
+                time.sleep(0.05)
+                try:
+                    watchdog.check()
+                except BuildTimeout as error:
+                    errors.append(error)
+
+        thread = threading.Thread(target=build)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_no_alarm_outside_pool_workers(self):
+        # glowny watek serwera (DXF_WORKERS=0) - bez SIGALRM, tylko sprawdzanie miedzy etapami
+        with Watchdog(0.01) as watchdog:
+            time.sleep(0.05)
+            with self.assertRaises(BuildTimeout):
+                watchdog.check()
+
+
+class DownloadViewTests(ViewTestCase):
+
+    def test_second_download_from_cache(self):
+        first = self.client.post('/beam/download_dxf_beam', beam())
+        self.assertEqual(first['X-DXF-Cache'], 'MISS')
+        second = self.client.post('/beam/download_dxf_beam', beam())
+        self.assertEqual(second['X-DXF-Cache'], 'HIT')
+        data = b''.join(first.streaming_content)
+        self.assertEqual(b''.join(second.streaming_content), data)
+        self.assertEqual(int(first['Content-Length']), len(data))
+
+    def test_etag_and_not_modified(self):
+        params = beam(name='Etag')
+        first = self.client.get('/beam/download_dxf_beam', params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first['Vary'], 'Accept-Encoding')
+        response = self.client.get('/beam/download_dxf_beam', params, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        # inne kodowanie - inny ETag, pelna odpowiedz
+        response = self.client.get('/beam/download_dxf_beam', params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    async def test_async_view(self):
+        url = f"/beam/download_dxf_beam_async?{urlencode(beam(name='Async'))}"
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sync = self.client.get('/beam/download_dxf_beam', beam(name='Async'))
+        self.assertEqual(response['ETag'], sync['ETag'])
+        self.assertEqual(sync['X-DXF-Cache'], 'HIT')
+
+    @override_settings(DXF_ASYNC_MAX_PENDING=0)
+    async def test_async_view_over_limit(self):
+        response = await self.async_client.get(f"/beam/download_dxf_beam_async?{urlencode(beam(name='Busy'))}")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.DXF_ASYNC_RETRY_AFTER))
+
+    def test_timeout_retry_after(self):
+        timeout = GenerationTimeout('generation exceeded 30 s')
+        with mock.patch.object(GenerationService, 'generate', side_effect=timeout), \
+                mock.patch.object(GenerationService, 'result', side_effect=timeout):
+            responses = [
+                self.client.get('/beam/download_dxf_beam', beam(name='Slow')),
+                self.client.post('/beam/download_dxf_batch?output=dxf', json.dumps([beam(name='Slow')]),
+                                 content_type='application/json'),
+            ]
+        for response in responses:
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], str(settings.DXF_ASYNC_RETRY_AFTER))
+
+    async def test_async_timeout_retry_after(self):
+        timeout = GenerationTimeout('generation exceeded 30 s')
+        with mock.patch.object(GenerationService, 'generate_async', side_effect=timeout):
+            response = await self.async_client.get(f"/beam/download_dxf_beam_async?{urlencode(beam(name='Slow'))}")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.DXF_ASYNC_RETRY_AFTER))
+
+    def test_server_timing_and_stats(self):
+        response = self.client.get('/beam/download_dxf_beam', beam(name='Timing'))
+        self.assertIn('save;dur=', response['Server-Timing'])
+        stats = self.client.get('/beam/stats').json()
+        self.assertEqual(stats['stages']['save']['count'], 1)
+
+    def test_invalid_input(self):
+        for changes in ({'secondary_stirrup_spacing': 0}, {'dxfversion': 'R9999'}, {'format': 'pdf'},
+                        {'beam_span': 'abc'}):
+            response = self.client.get('/beam/download_dxf_beam', beam(**changes))
+            self.assertEqual(response.status_code, 400, changes)
+        params = beam()
+        del params['beam_span']
+        response = self.client.get('/beam/download_dxf_beam', params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'beam_span', response.content)
+
+    async def test_invalid_input_async(self):
+        response = await self.async_client.get(
+            f"/beam/download_dxf_beam_async?{urlencode(beam(secondary_stirrup_spacing=0))}")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_not_modified_same_validators(self):
+        sync = await sync_to_async(self.client.get)('/beam/download_dxf_beam', beam(name='Etag'),
+                                                    HTTP_ACCEPT_ENCODING='gzip')
+        url = f"/beam/download_dxf_beam_async?{urlencode(beam(name='Etag'))}"
+        # AsyncClient przyjmuje naglowki pod nazwami HTTP, nie kluczami META
+        response = await self.async_client.get(url, **{'accept-encoding': 'gzip', 'if-none-match': sync['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response['Vary']), (sync['ETag'], sync['Vary']))
+
+    def test_over_budget_get_creates_no_job(self):
+        response = self.client.get('/beam/download_dxf_beam', beam(**HUGE))
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('stirrups', response.json()['over_budget'])
+
+    def test_etag_per_output_mode(self):
+        plain = self.client.get('/beam/download_dxf_beam', beam(name='Mode'))
+        with self.settings(DXF_DETERMINISTIC=True):
+            views.get_generation_service.cache_clear()
+            fixed = self.client.get('/beam/download_dxf_beam', beam(name='Mode'))
+        # plik zwykly z cache nie jest oddawany jako deterministyczny
+        self.assertEqual(fixed['X-DXF-Cache'], 'MISS')
+        self.assertNotEqual(fixed['ETag'], plain['ETag'])
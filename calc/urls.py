@@ -6,5 +6,13 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('beam/', views.beam, name='beam'),
     path('beam/download_dxf_beam', views.download_dxf_beam, name='beam_download'),
+    path('beam/download_dxf_beam_async', views.download_dxf_beam_async, name='beam_download_async'),
+    path('beam/stats', views.dxf_stats, name='beam_stats'),
+    path('beam/quantities', views.beam_quantities, name='beam_quantities'),
+    path('beam/sweep', views.beam_sweep_view, name='beam_sweep'),
+    path('beam/download_dxf_batch', views.download_dxf_batch, name='beam_download_batch'),
+    path('beam/jobs', views.job_submit, name='beam_job_submit'),
+    path('beam/jobs/<uuid:job_id>', views.job_status_view, name='beam_job_status'),
+    path('beam/jobs/<uuid:job_id>/download', views.job_download, name='beam_job_download'),
     path('author/', views.author, name='author')
 ]
\ No newline at end of file
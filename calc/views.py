@@ -1,12 +1,59 @@
+import json
 import os
-from django.http import HttpResponse
-from django.shortcuts import render
-from uuid import uuid4 as uuid
-from calc.app.mainclass import DxfElement
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, \
+    HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from ezdxf.lldxf.const import DXFVersionError
+from calc.app.batch import BatchError, admit_rows, build_combined, build_files, iter_zip, parse_rows, read_rows
+from calc.app.cache import DxfCache, cache_key
+from calc.app.compression import compress, negotiate_encoding
+from calc.app.cost import BuildCost, estimate_cost
+from calc.app.engine import GenerationBusy, GenerationLimiter, GenerationService, GenerationTimeout
+from calc.app.mainclass import iter_chunks
+from calc.app.model import BeamModel
+from calc.app.params import parse_beam_params, parse_model_params
+from calc.app.singleflight import SingleFlight
+from calc.app.sweep import beam_sweep
+from calc.app.timing import TimingStats, server_timing
+from calc.jobs import job_status, submit_job
+from calc.models import GenerationJob
 
 
 # Create your views here.
 
+@lru_cache(maxsize=None)
+def get_dxf_cache() -> DxfCache:
+    return DxfCache(settings.DXF_CACHE_DIR, settings.DXF_CACHE_MAX_BYTES)
+
+
+@lru_cache(maxsize=None)
+def get_generation_service() -> GenerationService:
+    return GenerationService(max_workers=settings.DXF_WORKERS, timeout=settings.DXF_TASK_TIMEOUT,
+                             max_tasks_per_worker=settings.DXF_MAX_TASKS_PER_WORKER,
+                             deterministic=settings.DXF_DETERMINISTIC, time_budget=settings.DXF_BUILD_TIME_BUDGET)
+
+
+@lru_cache(maxsize=None)
+def get_generation_limiter() -> GenerationLimiter:
+    return GenerationLimiter(settings.DXF_ASYNC_MAX_PENDING)
+
+
+@lru_cache(maxsize=None)
+def get_single_flight() -> SingleFlight:
+    return SingleFlight(settings.DXF_LOCK_DIR, lock_timeout=settings.DXF_TASK_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_timing_stats() -> TimingStats:
+    return TimingStats(settings.DXF_TIMING_WINDOW)
+
+
 def home(request):
     return render(request, 'home.html')
 
@@ -19,72 +66,372 @@ def author(request):
     return render(request, 'author.html')
 
 
+def _etag(key: str, encoding: str = None) -> str:
+    """Silny ETag z klucza cache (parametry + wersja generatora), osobny dla kazdego kodowania"""
+    return quote_etag(key if encoding is None else f'{key}-{encoding}')
+
+
+def _not_modified(request, etag: str) -> bool:
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
+def _validators(response: HttpResponse, etag: str) -> HttpResponse:
+    """ETag i Vary - wspolne dla pliku i 304, jedno miejsce dla widokow sync, async i wsadowych"""
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def _not_modified_response(etag: str) -> HttpResponseNotModified:
+    return _validators(HttpResponseNotModified(), etag)
+
+
+def _cached_dxf(key: str, encoding: str = None, data: bytes = None) -> bytes or None:
+    """
+    Plik w kodowaniu klienta: wersja skompresowana z cache albo kompresja pliku DXF i zapis obok.
+    data - plik juz zbudowany, bez niego plik DXF z cache (brak - None)
+    """
+    cache = get_dxf_cache()
+    encoded_key = f'{key}-{encoding}'
+    if encoding:
+        encoded = cache.get(encoded_key)
+        if encoded is not None:
+            return encoded
+    if data is None:
+        data = cache.get(key)
+    if data is not None and encoding:
+        data = compress(data, encoding, settings.DXF_COMPRESSION_LEVEL)
+        cache.put(encoded_key, data)
+    return data
+
+
+def _unavailable_response(error: GenerationBusy or GenerationTimeout) -> HttpResponse:
+    """503 z Retry-After: limit zadan zajety, pula procesow zabita albo budowanie ponad DXF_TASK_TIMEOUT"""
+    response = HttpResponse(str(error), status=503)
+    response['Retry-After'] = settings.DXF_ASYNC_RETRY_AFTER
+    return response
+
+
+def _generated(result, stages: list = None) -> bytes:
+    """Plik z wyniku generate(timed=settings.DXF_TIMING); czasy etapow do statystyk i do stages (Server-Timing)"""
+    if not settings.DXF_TIMING:
+        return result
+    data, timings = result
+    get_timing_stats().record(timings)
+    if stages is not None:
+        stages.extend(timings)
+    return data
+
+
+def _over_budget(request, params: dict, cost: BuildCost) -> JsonResponse:
+    """
+    Belka ponad DXF_COST_BUDGET: dla POST zadanie w tle (DXF_COST_OVER_BUDGET = 'job', 202 z adresem statusu)
+    albo 422; GET nie tworzy zadania (odnosnik, prefetch, ponowienie przegladarki) - 422 ze wskazowka.
+    Ponad DXF_COST_BUDGET_JOB zawsze 422
+    """
+    data = {'cost': cost.as_dict(),
+            'over_budget': {name: {'estimate': value, 'budget': limit}
+                            for name, (value, limit) in cost.over(settings.DXF_COST_BUDGET).items()}}
+    as_job = settings.DXF_COST_OVER_BUDGET == 'job' and not cost.over(settings.DXF_COST_BUDGET_JOB)
+    if as_job and request.method != 'POST':
+        data['error'] = "drawing is too large, send the same parameters with POST to build it in the background"
+        return JsonResponse(data, status=422)
+    if as_job:
+        job = submit_job([(1, params)], [], 'dxf')
+        data.update(job_status(job))
+        data['status_url'] = reverse('beam_job_status', args=[job.id])
+        return JsonResponse(data, status=202)
+    data['error'] = "drawing is too large"
+    return JsonResponse(data, status=422)
+
+
+def _dxf_response(data: bytes, name: str, encoding: str, etag: str, cache_status: str,
+                  stages: list = None) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(iter_chunks(data), content_type='application/dxf')
+    response['Content-Disposition'] = 'attachment; filename=' + f'{name}.dxf'
+    response['Content-Length'] = len(data)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    _validators(response, etag)
+    # przegladarka przechowuje plik, ale przy kazdym pobraniu pyta o zmiany (If-None-Match -> 304)
+    response['Cache-Control'] = 'private, no-cache'
+    response['X-DXF-Cache'] = cache_status
+    if stages:
+        response['Server-Timing'] = server_timing(stages)
+    return response
+
+
+def _beam_params(request) -> dict or HttpResponseBadRequest:
+    """Parametry belki z formularza (POST) albo adresu (GET); bledne dane - odpowiedz 400"""
+    try:
+        return parse_beam_params(request.POST if request.method == 'POST' else request.GET)
+    except KeyError as error:
+        return HttpResponseBadRequest(f"missing field {error}")
+    except (TypeError, ValueError) as error:
+        return HttpResponseBadRequest(str(error))
+
+
 def download_dxf_beam(request):
-    name = str(request.POST['name'])
-    beam_span = float(request.POST['beam_span'])
-    beam_height = float(request.POST['beam_height'])
-    beam_width = float(request.POST['beam_width'])
-    width_support_left = int(request.POST['width_support_left'])
-    width_support_right = int(request.POST['width_support_right'])
-    diameter_main_top = int(request.POST['diameter_main_top'])
-    quantity_main_top = int(request.POST['quantity_main_top'])
-    steel_grade_main_top = str(request.POST['steel_grade_main_top'])
-    diameter_main_bottom = int(request.POST['diameter_main_bottom'])
-    quantity_main_bottom = int(request.POST['quantity_main_bottom'])
-    steel_grade_main_bottom = str(request.POST['steel_grade_main_bottom'])
-    diameter_stirrup = int(request.POST['diameter_stirrup'])
-    steel_grade_stirrup = str(request.POST['steel_grade_stirrup'])
-    cover_top = int(request.POST['cover_top'])
-    cover_bottom = int(request.POST['cover_bottom'])
-    cover_view_left = int(request.POST['cover_view_left'])
-    cover_view_right = int(request.POST['cover_view_right'])
-    cover_left = int(request.POST['cover_left'])
-    cover_right = int(request.POST['cover_right'])
-    first_row_stirrup_range_left = int(request.POST['first_row_stirrup_range_left'])
-    first_row_stirrup_range_right = int(request.POST['first_row_stirrup_range_right'])
-    first_row_stirrup_spacing_left = int(request.POST['first_row_stirrup_spacing_left'])
-    first_row_stirrup_spacing_right = int(request.POST['first_row_stirrup_spacing_right'])
-    secondary_stirrup_spacing = int(request.POST['secondary_stirrup_spacing'])
-    number_of_elements = int(request.POST['number_of_elements'])
-    language = str(request.POST['language'])
-
-    drawing = DxfElement(
-        beam_span=beam_span,
-        beam_height=beam_height,
-        beam_width=beam_width,
-        width_support_left=width_support_left,
-        width_support_right=width_support_right,
-        diameter_main_top=diameter_main_top,
-        quantity_main_top=quantity_main_top,
-        steel_grade_main_top=steel_grade_main_top,
-        diameter_main_bottom=diameter_main_bottom,
-        quantity_main_bottom=quantity_main_bottom,
-        steel_grade_main_bottom=steel_grade_main_bottom,
-        diameter_stirrup=diameter_stirrup,
-        steel_grade_stirrup=steel_grade_stirrup,
-        cover_view_left=cover_view_left,
-        cover_view_right=cover_view_right,
-        cover_bottom=cover_bottom,
-        cover_top=cover_top,
-        cover_left=cover_left,
-        cover_right=cover_right,
-        first_row_stirrup_range_left=first_row_stirrup_range_left,
-        first_row_stirrup_range_right=first_row_stirrup_range_right,
-        first_row_stirrup_spacing_left=first_row_stirrup_spacing_left,
-        first_row_stirrup_spacing_right=first_row_stirrup_spacing_right,
-        secondary_stirrup_spacing=secondary_stirrup_spacing,
-        number_of_elements=number_of_elements,
-        name=name,
-        language=language
-    )
-    # dxfversion: str = 'R2010',
-    # start_point_x: float = 0,
-    # start_point_y: float = 0,
-
-    filepath = f'download/Files/temp/{uuid()}.dxf'
-    drawing.save(filepath)
-
-    with open(filepath, 'rt') as dxf_file:
-        response = HttpResponse(dxf_file.read())
-        response['Content-Disposition'] = 'attachment; filename=' + f'{name}.dxf'
+    params = _beam_params(request)
+    if isinstance(params, HttpResponseBadRequest):
+        return params
+
+    key = cache_key(params, deterministic=settings.DXF_DETERMINISTIC)
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    etag = _etag(key, encoding)
+    if _not_modified(request, etag):
+        # ten sam plik jest juz u klienta - bez generowania i bez czytania cache
+        return _not_modified_response(etag)
+
+    data = _cached_dxf(key, encoding)
+    cache_status = 'HIT'
+    stages = []
+    if data is None:
+        cost = estimate_cost(params)
+        if cost.over(settings.DXF_COST_BUDGET):
+            return _over_budget(request, params, cost)
+
+        def build() -> tuple[bytes, str]:
+            # inny proces mogl zbudowac plik, gdy to zadanie czekalo na blokade
+            cached = get_dxf_cache().get(key)
+            if cached is not None:
+                return cached, 'HIT'
+            built = _generated(get_generation_service().generate(params, timed=settings.DXF_TIMING), stages)
+            get_dxf_cache().put(key, built)
+            return built, 'MISS'
+
+        try:
+            (data, cache_status), shared = get_single_flight().do(key, build)
+        except (GenerationBusy, GenerationTimeout) as error:
+            return _unavailable_response(error)
+        except (ValueError, DXFVersionError) as error:
+            # parametry poprawne co do typu, ale belki nie da sie narysowac (np. rozstaw strzemion 0)
+            return HttpResponseBadRequest(str(error))
+        if shared:
+            # wynik jednoczesnego zadania z tymi samymi parametrami
+            cache_status = 'SHARED'
+        data = _cached_dxf(key, encoding, data)
+    return _dxf_response(data, params['name'], encoding, etag, cache_status, stages)
+
+
+async def download_dxf_beam_async(request):
+    """
+    download_dxf_beam dla serwera ASGI: budowanie w puli procesow bez zajmowania watku, limit zadan w toku
+    (DXF_ASYNC_MAX_PENDING) - powyzej limitu 503 z Retry-After zamiast kolejki, strony home/beam dzialaja dalej.
+    """
+    params = _beam_params(request)
+    if isinstance(params, HttpResponseBadRequest):
+        return params
+
+    key = cache_key(params, deterministic=settings.DXF_DETERMINISTIC)
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    etag = _etag(key, encoding)
+    if _not_modified(request, etag):
+        return _not_modified_response(etag)
+
+    data = await sync_to_async(_cached_dxf, thread_sensitive=False)(key, encoding)
+    cache_status = 'HIT'
+    stages = []
+    if data is None:
+        cost = estimate_cost(params)
+        if cost.over(settings.DXF_COST_BUDGET):
+            return await sync_to_async(_over_budget)(request, params, cost)
+
+        async def build() -> tuple[bytes, str]:
+            cache = get_dxf_cache()
+            cached = await sync_to_async(cache.get, thread_sensitive=False)(key)
+            if cached is not None:
+                return cached, 'HIT'
+            limiter = get_generation_limiter()
+            if not limiter.acquire():
+                raise GenerationBusy("too many drawings in progress, try again later")
+            try:
+                built = _generated(await get_generation_service().generate_async(params, timed=settings.DXF_TIMING),
+                                   stages)
+            finally:
+                limiter.release()
+            await sync_to_async(cache.put, thread_sensitive=False)(key, built)
+            return built, 'MISS'
+
+        try:
+            # czekajace duplikaty nie zajmuja miejsc w limicie zadan
+            (data, cache_status), shared = await get_single_flight().do_async(key, build)
+        except (GenerationBusy, GenerationTimeout) as error:
+            return _unavailable_response(error)
+        except (ValueError, DXFVersionError) as error:
+            return HttpResponseBadRequest(str(error))
+        if shared:
+            cache_status = 'SHARED'
+        data = await sync_to_async(_cached_dxf, thread_sensitive=False)(key, encoding, data)
+    return _dxf_response(data, params['name'], encoding, etag, cache_status, stages)
+
+
+def dxf_stats(request):
+    """Statystyki generatora (tylko z localhost): percentyle czasow etapow, cache, limit widoku async"""
+    if request.META.get('REMOTE_ADDR') not in ('127.0.0.1', '::1'):
+        return HttpResponseForbidden()
+    limiter = get_generation_limiter()
+    return JsonResponse({
+        'timing': settings.DXF_TIMING,
+        'stages': get_timing_stats().stats(),
+        'cache': get_dxf_cache().stats(),
+        'async': {'pending': limiter.pending, 'max_pending': limiter.max_pending, 'rejected': limiter.rejected},
+        'single_flight': get_single_flight().stats(),
+    })
+
+
+def _beam_quantities(data) -> dict:
+    return BeamModel(**parse_model_params(data)).quantities()
+
+
+@csrf_exempt
+def beam_quantities(request):
+    """
+    Ilosci stali i strzemion bez budowania rysunku (JSON). Dane jak w formularzu belki (GET, POST)
+    albo JSON: obiekt - jedna belka, lista lub {"beams": [...]} - wiele belek (bledy w "errors").
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError as error:
+            return JsonResponse({'error': f"invalid JSON: {error}"}, status=400)
+    else:
+        data = request.POST if request.method == 'POST' else request.GET
+
+    if isinstance(data, dict) and isinstance(data.get('beams'), list):
+        data = data['beams']
+    if not isinstance(data, list):
+        try:
+            return JsonResponse(_beam_quantities(data))
+        except KeyError as error:
+            return JsonResponse({'error': f"missing field {error}"}, status=400)
+        except (TypeError, ValueError) as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+    beams, errors = [], []
+    for row_number, row in enumerate(data, start=1):
+        try:
+            beams.append(dict(_beam_quantities(row), row=row_number))
+        except KeyError as error:
+            errors.append({'row': row_number, 'error': f"missing field {error}"})
+        except (AttributeError, TypeError, ValueError) as error:
+            errors.append({'row': row_number, 'error': str(error)})
+    return JsonResponse({'beams': beams, 'errors': errors})
+
+
+@csrf_exempt
+def beam_sweep_view(request):
+    """
+    Przeglad wariantow belki (JSON, POST): {"base": {...dane belki...}, "ranges": {"beam_height": [..] albo
+    {"start", "stop", "step"}, ...}, "sort": "mass_total", "limit": 100} - ranking wariantow bez rysowania.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body)
+        limit = min(int(data.get('limit', 100)), settings.DXF_SWEEP_MAX_ROWS)
+        return JsonResponse(beam_sweep(data.get('base', {}), data.get('ranges', {}), data.get('sort', 'mass_total'),
+                                       limit, settings.DXF_SWEEP_MAX_POINTS))
+    except json.JSONDecodeError as error:
+        return JsonResponse({'error': f"invalid JSON: {error}"}, status=400)
+    except KeyError as error:
+        return JsonResponse({'error': f"missing field {error}"}, status=400)
+    except (AttributeError, TypeError, ValueError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+
+def _read_batch(request, max_rows: int, budget: dict) -> tuple[list, list] or JsonResponse:
+    """
+    Wiersze z pliku CSV/JSON (pole 'file' albo tresc zapytania) w budzecie kosztu;
+    JsonResponse 400 gdy nie ma czego budowac
+    """
+    upload = request.FILES.get('file')
+    try:
+        if upload is not None:
+            rows = read_rows(upload.read(), upload.name, upload.content_type)
+        else:
+            rows = read_rows(request.body, content_type=request.content_type)
+    except (BatchError, UnicodeDecodeError) as error:
+        return JsonResponse({'errors': [{'row': None, 'error': str(error)}]}, status=400)
+    if not rows:
+        return JsonResponse({'errors': [{'row': None, 'error': "no rows"}]}, status=400)
+    if len(rows) > max_rows:
+        return JsonResponse({'errors': [{'row': None, 'error': f"max {max_rows} rows"}]}, status=400)
+
+    items, errors = parse_rows(rows)
+    items = admit_rows(items, errors, budget)
+    if not items:
+        return JsonResponse({'errors': errors}, status=400)
+    return items, errors
+
+
+@csrf_exempt
+def download_dxf_batch(request):
+    """
+    Wiele belek z jednego pliku CSV/JSON.
+    output=zip - archiwum z plikiem DXF dla kazdej belki, output=dxf - wszystkie belki na jednym rysunku.
+    Bledne wiersze nie przerywaja calosci, sa raportowane w errors.json albo naglowku X-Batch-Errors.
+    """
+    output = request.GET.get('output') or request.POST.get('output') or 'zip'
+    batch = _read_batch(request, settings.DXF_BATCH_MAX_ROWS, settings.DXF_COST_BUDGET)
+    if isinstance(batch, JsonResponse):
+        return batch
+    items, errors = batch
+
+    if output == 'dxf':
+        service = get_generation_service()
+        try:
+            combined = service.submit(build_combined, items, deterministic=service.deterministic,
+                                      time_budget=service.time_budget)
+            data, build_errors = service.result(combined, timeout=settings.DXF_TASK_TIMEOUT * len(items))
+        except (GenerationBusy, GenerationTimeout) as error:
+            return _unavailable_response(error)
+        errors = sorted(errors + build_errors, key=lambda error: error['row'])
+        if not data:
+            return JsonResponse({'errors': errors}, status=400)
+        response = StreamingHttpResponse(iter_chunks(data), content_type='application/dxf')
+        response['Content-Disposition'] = 'attachment; filename=batch.dxf'
+        response['Content-Length'] = len(data)
+        response['X-Batch-Errors'] = json.dumps(errors)
         return response
+
+    files = build_files(items, errors, get_dxf_cache(), get_generation_service())
+    response = StreamingHttpResponse(iter_zip(files), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename=batch.zip'
+    return response
+
+
+@csrf_exempt
+def job_submit(request):
+    """Zadanie w tle dla duzych zestawien (te same dane co beam/download_dxf_batch), odpowiedz od razu z id"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    output = request.GET.get('output') or request.POST.get('output') or 'zip'
+    batch = _read_batch(request, settings.DXF_JOB_MAX_ROWS, settings.DXF_COST_BUDGET_JOB)
+    if isinstance(batch, JsonResponse):
+        return batch
+    items, errors = batch
+    job = submit_job(items, errors, 'dxf' if output == 'dxf' else 'zip')
+    data = job_status(job)
+    data['status_url'] = reverse('beam_job_status', args=[job.id])
+    return JsonResponse(data, status=202)
+
+
+def job_status_view(request, job_id):
+    job = get_object_or_404(GenerationJob, id=job_id)
+    data = job_status(job)
+    if job.status == GenerationJob.DONE:
+        data['download_url'] = reverse('beam_job_download', args=[job.id])
+    return JsonResponse(data)
+
+
+def job_download(request, job_id):
+    job = get_object_or_404(GenerationJob, id=job_id, status=GenerationJob.DONE)
+    if not job.artifact or not os.path.exists(job.artifact):
+        raise Http404("artifact expired")
+    content_type = 'application/dxf' if job.output == 'dxf' else 'application/zip'
+    return FileResponse(open(job.artifact, 'rb'), as_attachment=True, filename=f'{job.id}.{job.output}',
+                        content_type=content_type)
@@ -139,3 +139,78 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# DXF generator - cache gotowych plikow DXF (LRU na dysku lokalnym), katalog v<wersja generatora>;
+# DXF_CACHE_MAX_BYTES - limit jednego procesu serwera (N procesow - do okolo N razy wiecej na dysku)
+
+DXF_CACHE_DIR = os.path.join(BASE_DIR, 'download', 'Files', 'cache')
+
+DXF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# tryb deterministyczny (wlaczany recznie): stale daty, GUID i znaczniki w pliku - te same parametry
+# i wersja generatora daja identyczne bajty DXF (cache HTTP/CDN, porownywanie plikow)
+DXF_DETERMINISTIC = False
+
+# poziom kompresji gzip/deflate pobieranych plikow DXF (1 - najszybciej, 9 - najmniejszy plik)
+DXF_COMPRESSION_LEVEL = 6
+
+# generowanie w puli procesow (forkserver): liczba procesow (0 - w watku serwera), limit czasu [s],
+# wymiana procesu po N zadaniach (max_tasks_per_child)
+DXF_WORKERS = os.cpu_count() or 1
+
+DXF_TASK_TIMEOUT = 30
+
+DXF_MAX_TASKS_PER_WORKER = 200
+
+# budzet kosztu rysunku (calc.app.cost.estimate_cost) - liczba strzemion; prety glowne i komorki wykazu
+# sa ograniczone przez BeamModel.LIMITS (najwyzej 80 pretow, 81 komorek), wiec nie maja osobnego limitu.
+# Pobranie belki ponad DXF_COST_BUDGET: zadanie w tle ('job', tylko POST - GET dostaje 422) albo odrzucenie
+# 422 ('reject'); ponad DXF_COST_BUDGET_JOB zawsze odrzucenie (takze wiersze zestawien i zadan w tle)
+DXF_COST_BUDGET = {'stirrups': 5000}
+
+DXF_COST_BUDGET_JOB = {'stirrups': 200000}
+
+DXF_COST_OVER_BUDGET = 'job'
+
+# limit czasu budowania jednej belki w procesie roboczym [s] - przerwanie rysunku bez wymiany procesu,
+# musi byc krotszy niz DXF_TASK_TIMEOUT
+DXF_BUILD_TIME_BUDGET = 10
+
+# widok async beam/download_dxf_beam_async: maksymalna liczba budowanych rysunkow w toku (reszta - 503),
+# Retry-After w odpowiedzi 503 [s] (rowniez po zabiciu puli procesow przez zawieszone zadanie)
+DXF_ASYNC_MAX_PENDING = 2 * (DXF_WORKERS or 1)
+
+DXF_ASYNC_RETRY_AFTER = 5
+
+# laczenie jednoczesnych pobran tej samej belki: blokady plikow wspolne dla procesow serwera na hoscie
+# (None - laczenie tylko w obrebie procesu)
+DXF_LOCK_DIR = os.path.join(BASE_DIR, 'download', 'Files', 'locks')
+
+# pomiar czasow etapow budowania rysunku (naglowek Server-Timing, beam/stats), liczba ostatnich pomiarow etapu
+DXF_TIMING = True
+
+DXF_TIMING_WINDOW = 1000
+
+# wartosci bazowe pomiarow manage.py dxf_benchmark (zapis: --save)
+DXF_BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'calc', 'benchmark_baseline.json')
+
+# maksymalna liczba belek w jednym zapytaniu beam/download_dxf_batch
+DXF_BATCH_MAX_ROWS = 500
+
+# zadania w tle (beam/jobs, manage.py dxf_worker): katalog wynikow, czas zycia [s], liczba prob,
+# czas bez bicia serca workera (heartbeat), po ktorym zadanie 'running' uznaje sie za porzucone [s]
+DXF_JOB_DIR = os.path.join(BASE_DIR, 'download', 'Files', 'jobs')
+
+DXF_JOB_TTL = 24 * 60 * 60
+
+DXF_JOB_MAX_ATTEMPTS = 3
+
+DXF_JOB_STALE_AFTER = 15 * 60
+
+DXF_JOB_MAX_ROWS = 5000
+
+# przeglad wariantow beam/sweep: maksymalna liczba punktow siatki, maksymalna liczba wierszy rankingu
+DXF_SWEEP_MAX_POINTS = 200000
+
+DXF_SWEEP_MAX_ROWS = 1000